@@ -0,0 +1,52 @@
+"""
+So sánh kích thước và thời gian mã hóa của các định dạng hình ảnh trên dữ liệu thật trong data/.
+
+    python encoding_report.py --zoom 1.5 --quality 80
+"""
+import argparse
+import time
+
+import fitz  # PyMuPDF
+
+import pdf_engine
+
+def measure(pdf_path: str, page_indices, zoom: float, formats, quality: int):
+    """
+    Chuyển đổi từng trang một lần rồi mã hóa pixmap theo từng định dạng.
+
+    Returns:
+        dict: Định dạng -> {'bytes': tổng kích thước, 'seconds': tổng thời gian mã hóa}.
+    """
+    results = {fmt: {'bytes': 0, 'seconds': 0.0} for fmt in formats}
+    with fitz.open(pdf_path) as doc:
+        for page_index in page_indices:
+            pix = doc.load_page(page_index).get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            for fmt in formats:
+                started = time.perf_counter()
+                data = pdf_engine.encode_pixmap(pix, fmt, quality)
+                results[fmt]['seconds'] += time.perf_counter() - started
+                results[fmt]['bytes'] += len(data)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Báo cáo kích thước/thời gian mã hóa theo định dạng hình ảnh.")
+    parser.add_argument("--pdf", default="./data/data.pdf", help="Tệp PDF cần đo.")
+    parser.add_argument("--zoom", type=float, default=1.5, help="Mức thu phóng.")
+    parser.add_argument("--quality", type=int, default=pdf_engine.IMAGE_QUALITY, help="Chất lượng JPEG/WebP.")
+    parser.add_argument("--pages", type=int, default=0, help="Chỉ đo N trang đầu (0 = tất cả).")
+    args = parser.parse_args(argv)
+
+    with fitz.open(args.pdf) as doc:
+        page_count = doc.page_count
+    page_indices = range(args.pages or page_count)
+    results = measure(args.pdf, page_indices, args.zoom, pdf_engine.IMAGE_FORMATS, args.quality)
+
+    baseline = results["png"]
+    print(f"{len(page_indices)} trang, thu phóng {args.zoom}, chất lượng {args.quality}")
+    print(f"{'định dạng':<10}{'MB':>10}{'s mã hóa':>12}{'so với PNG':>14}")
+    for fmt, r in results.items():
+        ratio = r['bytes'] / baseline['bytes'] if baseline['bytes'] else 0
+        print(f"{fmt:<10}{r['bytes'] / 1024 / 1024:>10.1f}{r['seconds']:>12.2f}{ratio:>13.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Bố cục văn bản có cấu trúc của một trang (khối, dòng, đoạn chữ và từ kèm tọa độ, phông chữ),
+lưu theo dạng cột nhị phân gọn để dùng lại mà không cần phân tích lại PDF.
+
+Định dạng tuần tự hóa (nén zlib):
+
+    <độ dài tiêu đề: 4 byte> <tiêu đề JSON> <các mảng số liên tiếp>
+
+Tiêu đề chứa kích thước trang, bảng phông chữ, văn bản nối liền của các đoạn chữ và các từ,
+cùng độ dài (số phần tử) của từng mảng theo thứ tự ARRAY_FIELDS.
+"""
+import json
+import struct
+import zlib
+from array import array
+
+LAYOUT_VERSION = 1
+
+# (tên mảng, mã kiểu của array, số phần tử cho mỗi đoạn chữ/từ)
+ARRAY_FIELDS = (
+    ("span_bbox", "f", 4),     # x0, y0, x1, y1
+    ("span_meta", "i", 4),     # khối, dòng, chỉ số phông chữ, cờ kiểu chữ
+    ("span_size", "f", 1),     # cỡ chữ
+    ("span_offsets", "I", 1),  # vị trí bắt đầu trong span_text (thêm một phần tử kết thúc)
+    ("word_bbox", "f", 4),     # x0, y0, x1, y1
+    ("word_meta", "i", 3),     # khối, dòng, thứ tự từ trong dòng
+    ("word_offsets", "I", 1),  # vị trí bắt đầu trong word_text (thêm một phần tử kết thúc)
+)
+
+class PageLayout:
+    """
+    Bố cục một trang ở dạng cột: mỗi thuộc tính là một mảng số phẳng, văn bản được nối liền.
+    """
+
+    def __init__(self, width: float = 0.0, height: float = 0.0):
+        self.width = width
+        self.height = height
+        self.fonts = []
+        self.span_text = ""
+        self.word_text = ""
+        for name, typecode, _ in ARRAY_FIELDS:
+            setattr(self, name, array(typecode))
+        self.span_offsets.append(0)
+        self.word_offsets.append(0)
+
+    @property
+    def span_count(self) -> int:
+        return len(self.span_size)
+
+    @property
+    def word_count(self) -> int:
+        return len(self.word_offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(getattr(self, name).itemsize * len(getattr(self, name)) for name, _, _ in ARRAY_FIELDS)
+        return arrays + len(self.span_text) * 2 + len(self.word_text) * 2
+
+    def word(self, i: int) -> tuple:
+        """
+        Trả về (x0, y0, x1, y1, từ, khối, dòng, thứ tự) như page.get_text("words").
+        """
+        return (*self.word_bbox[4 * i:4 * i + 4],
+                self.word_text[self.word_offsets[i]:self.word_offsets[i + 1]],
+                *self.word_meta[3 * i:3 * i + 3])
+
+    def words(self):
+        return [self.word(i) for i in range(self.word_count)]
+
+    def text_in_reading_order(self) -> str:
+        """
+        Dựng lại văn bản theo thứ tự đọc: các dòng được xếp theo cột (nửa trái/phải trang),
+        rồi từ trên xuống dưới, từ trái sang phải.
+        """
+        lines = {}
+        for i in range(self.span_count):
+            block, line = self.span_meta[4 * i], self.span_meta[4 * i + 1]
+            x0, y0 = self.span_bbox[4 * i], self.span_bbox[4 * i + 1]
+            entry = lines.setdefault((block, line), [x0, y0, []])
+            entry[0] = min(entry[0], x0)
+            entry[1] = min(entry[1], y0)
+            entry[2].append(self.span_text[self.span_offsets[i]:self.span_offsets[i + 1]])
+        middle = self.width / 2 if self.width else float("inf")
+        ordered = sorted(lines.values(), key=lambda e: (e[0] >= middle, round(e[1], 1), e[0]))
+        return "\n".join("".join(parts) for _, _, parts in ordered)
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            'version': LAYOUT_VERSION,
+            'width': self.width,
+            'height': self.height,
+            'fonts': self.fonts,
+            'span_text': self.span_text,
+            'word_text': self.word_text,
+            'lengths': [len(getattr(self, name)) for name, _, _ in ARRAY_FIELDS],
+        }, ensure_ascii=False).encode('utf-8')
+        body = b"".join(getattr(self, name).tobytes() for name, _, _ in ARRAY_FIELDS)
+        return zlib.compress(struct.pack("<I", len(header)) + header + body)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        raw = zlib.decompress(data)
+        (header_len,) = struct.unpack_from("<I", raw)
+        header = json.loads(raw[4:4 + header_len].decode('utf-8'))
+        if header.get('version') != LAYOUT_VERSION:
+            raise ValueError(f"Phiên bản bố cục không được hỗ trợ: {header.get('version')}")
+        layout = cls(header['width'], header['height'])
+        layout.fonts = header['fonts']
+        layout.span_text = header['span_text']
+        layout.word_text = header['word_text']
+        offset = 4 + header_len
+        for (name, typecode, _), length in zip(ARRAY_FIELDS, header['lengths']):
+            values = array(typecode)
+            values.frombytes(raw[offset:offset + length * values.itemsize])
+            offset += length * values.itemsize
+            setattr(layout, name, values)
+        return layout
+
+def extract_layout(page) -> PageLayout:
+    """
+    Trích xuất bố cục có cấu trúc từ một trang PyMuPDF.
+
+    Args:
+        page (fitz.Page): Trang đã nạp.
+
+    Returns:
+        PageLayout: Bố cục của trang.
+    """
+    layout = PageLayout(page.rect.width, page.rect.height)
+    font_index = {}
+    span_parts = []
+    for block_no, block in enumerate(page.get_text("dict")["blocks"]):
+        if block.get("type") != 0:
+            continue  # Bỏ qua khối hình ảnh
+        for line_no, line in enumerate(block["lines"]):
+            for span in line["spans"]:
+                font = font_index.setdefault(span["font"], len(font_index))
+                layout.span_bbox.extend(span["bbox"])
+                layout.span_meta.extend((block_no, line_no, font, span["flags"]))
+                layout.span_size.append(span["size"])
+                span_parts.append(span["text"])
+                layout.span_offsets.append(layout.span_offsets[-1] + len(span["text"]))
+    layout.fonts = list(font_index)
+    layout.span_text = "".join(span_parts)
+
+    word_parts = []
+    for x0, y0, x1, y1, word, block_no, line_no, word_no in page.get_text("words"):
+        layout.word_bbox.extend((x0, y0, x1, y1))
+        layout.word_meta.extend((block_no, line_no, word_no))
+        word_parts.append(word)
+        layout.word_offsets.append(layout.word_offsets[-1] + len(word))
+    layout.word_text = "".join(word_parts)
+    return layout
@@ -0,0 +1,1085 @@
+"""
+Phần xử lý PDF dùng chung, không phụ thuộc Streamlit: bộ nhớ đệm (đĩa và bộ nhớ), bể tài liệu,
+gộp yêu cầu giống nhau (single-flight), chuyển đổi trang/ô/ảnh thu nhỏ, trích xuất văn bản và bố cục,
+bể tiến trình chuyển đổi và máy khách của dịch vụ chuyển đổi.
+
+Được dùng bởi giao diện (viewer.py), dịch vụ chuyển đổi (render_service.py) và các công cụ dòng lệnh.
+Lỗi được báo bằng ngoại lệ; phía gọi quyết định cách hiển thị.
+"""
+import atexit
+import hashlib
+import multiprocessing
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import urllib.request
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from io import BytesIO
+from urllib.parse import urlencode
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+from page_layout import PageLayout, extract_layout
+from search_index import tokenize
+import timing
+
+# Thư mục và dung lượng tối đa của bộ nhớ đệm hình ảnh trên đĩa (dùng chung cho mọi phiên)
+RENDER_CACHE_DIR = os.environ.get("PDFVIEW_RENDER_CACHE_DIR", os.path.join(".cache", "render"))
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("PDFVIEW_RENDER_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# Khi vượt giới hạn, xóa đến mức này (tỷ lệ của giới hạn) để không phải quét lại ở mỗi lần ghi
+RENDER_CACHE_LOW_WATER = 0.9
+# Định dạng mã hóa hình ảnh trang ("png", "jpeg", "webp") và chất lượng cho định dạng nén mất dữ liệu
+IMAGE_FORMATS = ("png", "jpeg", "webp")
+IMAGE_FORMAT = os.environ.get("PDFVIEW_IMAGE_FORMAT", "png").lower()
+IMAGE_QUALITY = int(os.environ.get("PDFVIEW_IMAGE_QUALITY", 80))
+# Chuyển đổi theo ô ở mức thu phóng cao: mỗi ô TILE_SIZE x TILE_SIZE điểm ảnh được chuyển đổi
+# (qua vùng cắt) và lưu riêng; chỉ các hàng ô trong vùng xem được chuyển đổi
+TILE_SIZE = int(os.environ.get("PDFVIEW_TILE_SIZE", 512))
+# Ảnh thu nhỏ độ phân giải thấp hiển thị ngay trong lúc chờ bản đầy đủ; không bao giờ bị xóa
+THUMBNAIL_ZOOM = 0.4
+THUMBNAIL_CACHE_DIR = os.environ.get("PDFVIEW_THUMBNAIL_CACHE_DIR", os.path.join(".cache", "thumbnails"))
+# Bố cục văn bản có cấu trúc (khối/dòng/đoạn chữ/từ kèm tọa độ) được lưu trên đĩa và trong bộ nhớ
+LAYOUT_CACHE_DIR = os.environ.get("PDFVIEW_LAYOUT_CACHE_DIR", os.path.join(".cache", "layout"))
+LAYOUT_FORMAT = "layout-v1"
+LAYOUT_MEMORY_MAX_BYTES = int(os.environ.get("PDFVIEW_LAYOUT_MEMORY_MAX_BYTES", 32 * 1024 * 1024))
+# Lớp phủ tô sáng kết quả tìm kiếm (RGBA) và bộ nhớ đệm hình ảnh đã tô sáng
+HIGHLIGHT_COLOR = (255, 214, 0, 110)
+HIGHLIGHT_CACHE_MAX_BYTES = int(os.environ.get("PDFVIEW_HIGHLIGHT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Ngân sách bộ nhớ cho văn bản trích xuất được ghi nhớ trong tiến trình
+TEXT_CACHE_MAX_BYTES = int(os.environ.get("PDFVIEW_TEXT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Số tài liệu PDF tối đa được giữ mở đồng thời trong bể tài liệu
+DOCUMENT_POOL_MAX_OPEN = int(os.environ.get("PDFVIEW_DOCUMENT_POOL_MAX_OPEN", 32))
+# Số tiến trình chuyển đổi trang song song (1 = chuyển đổi ngay trên luồng của phiên)
+RENDER_WORKERS = int(os.environ.get("PDFVIEW_RENDER_WORKERS", os.cpu_count() or 1))
+# Địa chỉ dịch vụ chuyển đổi chạy trong tiến trình riêng (render_service.py); rỗng = chuyển đổi ngay
+# trong tiến trình Streamlit. Số kết nối đồng thời tới dịch vụ và thời gian chờ tối đa (giây)
+RENDER_SERVICE_URL = os.environ.get("PDFVIEW_RENDER_SERVICE_URL", "").rstrip("/")
+RENDER_SERVICE_CONNECTIONS = int(os.environ.get("PDFVIEW_RENDER_SERVICE_CONNECTIONS", 16))
+RENDER_SERVICE_TIMEOUT = float(os.environ.get("PDFVIEW_RENDER_SERVICE_TIMEOUT", 120))
+# Giới hạn số ký tự văn bản trả về mặc định (khung văn bản của giao diện)
+TEXT_VIEW_LIMIT = int(os.environ.get("PDFVIEW_TEXT_VIEW_LIMIT", 230000))
+
+_file_hash_memo = {}
+_file_hash_lock = threading.Lock()
+
+def file_content_hash(path: str) -> str:
+    """
+    Tính mã băm SHA-256 của nội dung tệp, ghi nhớ theo (kích thước, mtime) để không băm lại.
+
+    Args:
+        path (str): Đường dẫn đến tệp.
+
+    Returns:
+        str: Chuỗi hex SHA-256 của nội dung tệp.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_hash_lock:
+        digest = _file_hash_memo.get(memo_key)
+    if digest is not None:
+        return digest
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _file_hash_lock:
+        _file_hash_memo[memo_key] = digest
+    return digest
+
+class RenderCache:
+    """
+    Bộ nhớ đệm hình ảnh trang trên đĩa, định danh theo nội dung (mã băm tệp, trang, thu phóng, định dạng).
+
+    Mỗi mục là một tệp riêng; thời điểm sửa đổi của tệp được cập nhật mỗi lần đọc để
+    làm thứ tự LRU, và các mục cũ nhất bị xóa khi tổng dung lượng vượt quá giới hạn
+    (max_bytes=None: không giới hạn, không xóa).
+
+    Nhiều tiến trình (các phiên, tiến trình con chuyển đổi, dịch vụ chuyển đổi) cùng ghi vào một
+    thư mục, nên việc xóa dựa trên dung lượng thật trên đĩa: mỗi tiến trình quét lại thư mục sau khi
+    tự ghi thêm (1 - RENDER_CACHE_LOW_WATER) giới hạn, và khi vượt giới hạn thì xóa xuống mức thấp.
+    """
+
+    def __init__(self, cache_dir: str = RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_MAX_BYTES, low_water: float = RENDER_CACHE_LOW_WATER):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Quét ngay ở lần ghi đầu tiên: thư mục có thể đã đầy do tiến trình khác
+        self._written_since_scan = None
+
+    @staticmethod
+    def make_key(file_hash: str, page_number: int, zoom: float, fmt: str) -> str:
+        raw = f"{file_hash}:{page_number}:{zoom:.3f}:{fmt.lower()}"
+        # Tiền tố là mã băm tệp nguồn để có thể xóa mọi mục của một tệp đã thay đổi
+        return f"{file_hash[:32]}-{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key.split('-', 1)[0], key)
+
+    def invalidate_file(self, file_hash: str) -> int:
+        """
+        Xóa mọi hình ảnh được chuyển đổi từ một phiên bản tệp nguồn.
+
+        Args:
+            file_hash (str): Mã băm nội dung của tệp nguồn cũ.
+
+        Returns:
+            int: Số byte đã giải phóng.
+        """
+        file_dir = os.path.join(self.cache_dir, file_hash[:32])
+        if not os.path.isdir(file_dir):
+            return 0
+        freed = sum(os.path.getsize(os.path.join(file_dir, name)) for name in os.listdir(file_dir))
+        shutil.rmtree(file_dir, ignore_errors=True)
+        return freed
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith('.'):
+                    continue  # Bỏ qua tệp tạm đang ghi dở
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Đánh dấu vừa được dùng cho LRU
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Ghi vào tệp tạm rồi đổi tên để các phiên/tiến trình khác không đọc phải tệp ghi dở
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            if self._written_since_scan is not None:
+                self._written_since_scan += len(data)
+                if self._written_since_scan < self.max_bytes * (1 - self.low_water):
+                    return
+            self._written_since_scan = 0
+            self.enforce_limit()
+
+    def enforce_limit(self) -> int:
+        """
+        Đo dung lượng thật của thư mục; nếu vượt giới hạn, xóa các mục cũ nhất đến mức thấp.
+
+        Returns:
+            int: Tổng dung lượng còn lại trên đĩa.
+        """
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        if self.max_bytes is None or total <= self.max_bytes:
+            return total
+        target = self.max_bytes * self.low_water
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass  # Tiến trình khác vừa xóa
+        return total
+
+class MemoryLRUCache:
+    """
+    Bộ nhớ đệm LRU trong tiến trình, giới hạn theo tổng số byte của các giá trị.
+
+    An toàn khi dùng từ nhiều luồng (mỗi phiên Streamlit chạy trên một luồng riêng)
+    và đếm số lần trúng/trượt để theo dõi hiệu quả.
+    """
+
+    def __init__(self, max_bytes: int, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._total_bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                return  # Giá trị lớn hơn cả ngân sách: không lưu
+            self._data[key] = (value, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._total_bytes = 0
+
+    def invalidate(self, predicate) -> int:
+        """
+        Xóa các mục có khóa thỏa điều kiện.
+
+        Returns:
+            int: Số mục đã xóa.
+        """
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                self._total_bytes -= self._data.pop(key)[1]
+            return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._data),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+# Người chờ nhận giá trị này khi lời gọi dẫn đầu bị ngắt bởi ngoại lệ điều khiển luồng
+_RETRY = object()
+
+class SingleFlight:
+    """
+    Gộp các lời gọi giống hệt nhau đang chạy đồng thời (single-flight): lời gọi đầu tiên với một khóa
+    thực hiện công việc, các lời gọi cùng khóa đến trong lúc đó chờ và nhận chung kết quả (hoặc ngoại lệ).
+
+    Khóa chỉ tồn tại khi công việc đang chạy; kết quả lâu dài do các bộ nhớ đệm đảm nhận.
+    Với công việc bất đồng bộ, số người chờ được đếm để chỉ hủy khi không còn ai cần kết quả.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.shared = 0
+        self._calls = {}
+        self._refs = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Chạy fn() trên luồng hiện tại, hoặc chờ lời gọi cùng khóa đang chạy.
+
+        Chỉ lỗi thông thường (Exception) được chia cho người chờ. Ngoại lệ điều khiển luồng
+        (ví dụ lệnh dừng/chạy lại của Streamlit) chỉ thuộc về luồng gọi: khóa được bỏ và
+        người chờ tự thử lại.
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = self._calls[key] = Future()
+                    self.leaders += 1
+                else:
+                    self.shared += 1
+            if not leader:
+                result = future.result()
+                if result is _RETRY:
+                    continue
+                return result
+            try:
+                result = fn()
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            except BaseException:
+                self._forget(key, future)
+                future.set_result(_RETRY)
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                self._forget(key, future)
+
+    def submit(self, key, start) -> Future:
+        """
+        Gửi công việc bất đồng bộ: start() phải trả về ngay một Future (ví dụ executor.submit);
+        lời gọi cùng khóa trong lúc Future chưa xong nhận lại chính Future đó.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                self._refs[future] = self._refs.get(future, 0) + 1
+                return future
+            future = start()
+            self._calls[key] = future
+            self._refs[future] = 1
+            self.leaders += 1
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def release(self, future: Future) -> bool:
+        """
+        Báo rằng một người chờ không còn cần kết quả; hủy công việc khi không còn ai chờ.
+
+        Returns:
+            bool: True nếu công việc đã được hủy.
+        """
+        with self._lock:
+            refs = self._refs.get(future, 1) - 1
+            if refs > 0:
+                self._refs[future] = refs
+                return False
+            self._refs.pop(future, None)
+        return future.cancel()
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+            self._refs.pop(future, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'leaders': self.leaders, 'shared': self.shared, 'inflight': len(self._calls)}
+
+# Các yêu cầu chuyển đổi/trích xuất đang chạy, dùng chung cho mọi phiên của tiến trình
+single_flight = SingleFlight()
+
+# Văn bản đã trích xuất, định danh theo (đường dẫn, mtime, số trang)
+text_cache = MemoryLRUCache(TEXT_CACHE_MAX_BYTES, sizeof=lambda text: len(text.encode('utf-8')))
+
+class _PooledDocument:
+    def __init__(self, doc, mtime_ns: int):
+        self.doc = doc
+        self.mtime_ns = mtime_ns
+        self.users = 0
+        self.lock = threading.Lock()  # PyMuPDF không an toàn khi nhiều luồng dùng chung một tài liệu
+
+class DocumentPool:
+    """
+    Bể các đối tượng fitz.Document được giữ mở giữa các lần chạy lại.
+
+    Mỗi tài liệu chỉ được một luồng dùng tại một thời điểm (khóa riêng cho từng tài liệu).
+    Khi vượt quá số tài liệu mở tối đa, tài liệu ít được dùng gần đây nhất mà không có
+    luồng nào đang giữ sẽ bị đóng. Tệp bị thay đổi trên đĩa (mtime khác) sẽ được mở lại.
+    """
+
+    def __init__(self, max_open: int = DOCUMENT_POOL_MAX_OPEN):
+        self.max_open = max_open
+        self._docs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self, pdf_path: str):
+        key = os.path.abspath(pdf_path)
+        mtime_ns = os.stat(key).st_mtime_ns
+        with self._lock:
+            entry = self._docs.get(key)
+            if entry is not None and entry.mtime_ns != mtime_ns and entry.users == 0:
+                del self._docs[key]
+                entry.doc.close()
+                entry = None
+            if entry is None:
+                with timing.span("fitz_open"):
+                    entry = _PooledDocument(fitz.open(key), mtime_ns)
+                self._docs[key] = entry
+            entry.users += 1
+            self._docs.move_to_end(key)
+        try:
+            with entry.lock:
+                yield entry.doc
+        finally:
+            with self._lock:
+                entry.users -= 1
+                self._evict_idle()
+
+    def _evict_idle(self):
+        for key in list(self._docs):
+            if len(self._docs) <= self.max_open:
+                break
+            entry = self._docs[key]
+            if entry.users == 0:
+                del self._docs[key]
+                entry.doc.close()
+
+    def close_all(self):
+        with self._lock:
+            for entry in self._docs.values():
+                entry.doc.close()
+            self._docs.clear()
+
+# Bể tài liệu dùng chung cho toàn tiến trình
+document_pool = DocumentPool()
+atexit.register(document_pool.close_all)
+
+# Bố cục đã giải mã, định danh theo (mã băm tệp, số trang)
+layout_cache = MemoryLRUCache(LAYOUT_MEMORY_MAX_BYTES, sizeof=lambda layout: layout.nbytes)
+# Hình ảnh đã tô sáng, định danh theo (mã băm ảnh gốc, từ khóa)
+highlight_cache = MemoryLRUCache(HIGHLIGHT_CACHE_MAX_BYTES)
+
+_render_cache = None
+_thumbnail_cache = None
+_layout_cache = None
+_render_cache_lock = threading.Lock()
+
+def get_render_cache() -> RenderCache:
+    """
+    Trả về bộ nhớ đệm hình ảnh dùng chung cho toàn tiến trình (khởi tạo khi cần).
+    """
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache()
+        return _render_cache
+
+def get_thumbnail_cache() -> RenderCache:
+    """
+    Trả về bộ nhớ đệm ảnh thu nhỏ (không giới hạn dung lượng, giữ vĩnh viễn).
+    """
+    global _thumbnail_cache
+    with _render_cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = RenderCache(THUMBNAIL_CACHE_DIR, max_bytes=None)
+        return _thumbnail_cache
+
+def get_layout_cache() -> RenderCache:
+    """
+    Trả về bộ nhớ đệm bố cục trang trên đĩa (không giới hạn dung lượng, vì bố cục rất nhỏ).
+    """
+    global _layout_cache
+    with _render_cache_lock:
+        if _layout_cache is None:
+            _layout_cache = RenderCache(LAYOUT_CACHE_DIR, max_bytes=None)
+        return _layout_cache
+
+def load_checked_page(doc, pdf_path: str, page_number: int):
+    """
+    Nạp một trang của tài liệu đã mở.
+
+    Raises:
+        ValueError: Số trang nằm ngoài phạm vi của tệp.
+    """
+    if page_number < 0 or page_number >= doc.page_count:
+        raise ValueError(f"Số trang {page_number + 1} vượt quá phạm vi cho tệp '{pdf_path}'.")
+    return doc.load_page(page_number)
+
+def pymupdf_extract_layout(pdf_path: str, page_number: int = 0) -> PageLayout:
+    """
+    Trích xuất bố cục có cấu trúc (khối, dòng, đoạn chữ, từ kèm tọa độ và phông chữ) của một trang.
+
+    Mỗi trang chỉ được phân tích một lần: kết quả được lưu ở dạng cột nhị phân trên đĩa
+    và giữ bản đã giải mã trong bộ nhớ.
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_number (int): Số trang (chỉ số bắt đầu từ 0).
+
+    Returns:
+        PageLayout: Bố cục của trang.
+
+    Raises:
+        Exception: Không mở được tệp, số trang ngoài phạm vi hoặc lỗi phân tích trang.
+    """
+    file_hash = file_content_hash(pdf_path)
+    memo_key = (file_hash, page_number)
+    layout = layout_cache.get(memo_key)
+    if layout is not None:
+        return layout
+    # Nhiều phiên mở cùng một trang cùng lúc chỉ phân tích trang đó một lần
+    return single_flight.do(("layout", memo_key), lambda: _load_layout(pdf_path, page_number, file_hash))
+
+def _load_layout(pdf_path: str, page_number: int, file_hash: str):
+    layout = None
+    disk_key = RenderCache.make_key(file_hash, page_number, 0.0, LAYOUT_FORMAT)
+    data = get_layout_cache().get(disk_key)
+    if data is not None:
+        try:
+            layout = PageLayout.from_bytes(data)
+        except (ValueError, zlib.error, struct.error):
+            layout = None  # Bản lưu hỏng hoặc khác phiên bản: phân tích lại trang
+    if layout is None:
+        with document_pool.checkout(pdf_path) as doc:
+            layout = extract_layout(load_checked_page(doc, pdf_path, page_number))
+        try:
+            get_layout_cache().put(disk_key, layout.to_bytes())
+        except OSError:
+            pass
+    layout_cache.put((file_hash, page_number), layout)
+    return layout
+
+def find_highlight_boxes(layout: PageLayout, terms):
+    """
+    Tìm khung bao (tọa độ trang PDF) của các từ khớp với từ khóa tìm kiếm đã gấp dấu.
+
+    Args:
+        layout (PageLayout): Bố cục của trang.
+        terms (tuple of str): Các từ khóa đã gấp dấu (xem search_index.tokenize).
+
+    Returns:
+        list of tuple: Các khung (x0, y0, x1, y1).
+    """
+    wanted = set(terms)
+    boxes = []
+    for x0, y0, x1, y1, word, *_ in layout.words():
+        if wanted.intersection(tokenize(word)):
+            boxes.append((x0, y0, x1, y1))
+    return boxes
+
+def composite_highlights(img_bytes: bytes, boxes, scale: float, fmt: str = IMAGE_FORMAT) -> bytes:
+    """
+    Phủ các khung tô sáng bán trong suốt lên hình ảnh trang đã chuyển đổi (không chuyển đổi lại PDF).
+
+    Args:
+        img_bytes (bytes): Hình ảnh trang gốc.
+        boxes (list of tuple): Các khung theo tọa độ trang PDF.
+        scale (float): Tỉ lệ từ tọa độ PDF sang điểm ảnh (bằng mức thu phóng khi chuyển đổi).
+        fmt (str): Định dạng hình ảnh đầu ra.
+
+    Returns:
+        bytes: Hình ảnh đã tô sáng.
+    """
+    with Image.open(BytesIO(img_bytes)) as base:
+        image = base.convert("RGBA")
+    overlay = Image.new("RGBA", image.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    for x0, y0, x1, y1 in boxes:
+        draw.rectangle((x0 * scale, y0 * scale, x1 * scale, y1 * scale), fill=HIGHLIGHT_COLOR)
+    image = Image.alpha_composite(image, overlay).convert("RGB")
+    return encode_image(image, fmt)
+
+def apply_search_highlights(img_bytes: bytes, pdf_path: str, page_index: int, scale: float, terms, fmt: str = IMAGE_FORMAT) -> bytes:
+    """
+    Tô sáng các từ khớp tìm kiếm trên hình ảnh trang, dùng bố cục từ đã lưu và hình ảnh gốc đã lưu.
+
+    Args:
+        img_bytes (bytes): Hình ảnh trang gốc.
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_index (int): Chỉ số trang trong tệp (bắt đầu từ 0).
+        scale (float): Mức thu phóng của hình ảnh.
+        terms (tuple of str): Các từ khóa đã gấp dấu.
+        fmt (str): Định dạng hình ảnh.
+
+    Returns:
+        bytes: Hình ảnh đã tô sáng, hoặc hình ảnh gốc nếu trang không có từ khớp.
+    """
+    if not img_bytes or not terms:
+        return img_bytes
+    memo_key = (hashlib.sha256(img_bytes).hexdigest(), tuple(terms))
+    cached = highlight_cache.get(memo_key)
+    if cached is not None:
+        return cached
+    layout = pymupdf_extract_layout(pdf_path, page_index)
+    boxes = find_highlight_boxes(layout, terms) if layout is not None else []
+    result = composite_highlights(img_bytes, boxes, scale, fmt) if boxes else img_bytes
+    highlight_cache.put(memo_key, result)
+    return result
+
+def text_cache_key(pdf_path: str, page_number: int):
+    """
+    Khóa bộ đệm văn bản của một trang, gắn với thời điểm sửa tệp để tự mất hiệu lực khi tệp đổi.
+
+    Returns:
+        tuple | None: Khóa bộ đệm, hoặc None nếu không đọc được tệp.
+    """
+    try:
+        return (os.path.abspath(pdf_path), os.stat(pdf_path).st_mtime_ns, page_number)
+    except OSError:
+        return None
+
+def pymupdf_parse_page(pdf_path: str, page_number: int = 0, limit: int = TEXT_VIEW_LIMIT) -> str:
+    """
+    Trích xuất văn bản từ một trang cụ thể trong tệp PDF.
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_number (int): Số trang để trích xuất văn bản (chỉ số bắt đầu từ 0).
+        limit (int): Số ký tự tối đa trả về (None = toàn bộ).
+
+    Returns:
+        str: Văn bản đã trích xuất từ trang được chỉ định.
+    """
+    cache_key = text_cache_key(pdf_path, page_number)
+    if cache_key is not None:
+        cached = text_cache.get(cache_key)
+        if cached is not None:
+            return cached[:limit]
+
+    def extract():
+        with document_pool.checkout(pdf_path) as file:
+            page = load_checked_page(file, pdf_path, page_number)
+            with timing.span("get_text"):
+                text = page.get_text()
+        if cache_key is not None:
+            text_cache.put(cache_key, text)
+        return text
+
+    if cache_key is None:
+        return extract()[:limit]
+    return single_flight.do(("text", cache_key), extract)[:limit]  # Giới hạn kích thước văn bản
+
+def image_cache_format(fmt: str) -> str:
+    """
+    Tạo phần định dạng của khóa bộ nhớ đệm (kèm chất lượng với định dạng nén mất dữ liệu).
+    """
+    fmt = fmt.lower()
+    return fmt if fmt == "png" else f"{fmt}-q{IMAGE_QUALITY}"
+
+def encode_image(img, fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> bytes:
+    """
+    Mã hóa một hình ảnh Pillow theo định dạng yêu cầu.
+
+    Args:
+        img (PIL.Image.Image): Hình ảnh cần mã hóa.
+        fmt (str): "png", "jpeg" hoặc "webp".
+        quality (int): Chất lượng (1–100) cho JPEG và WebP.
+
+    Returns:
+        bytes: Dữ liệu hình ảnh đã mã hóa.
+    """
+    pil_format = {"png": "PNG", "jpeg": "JPEG", "jpg": "JPEG", "webp": "WEBP"}.get(fmt.lower())
+    if pil_format is None:
+        raise ValueError(f"Định dạng hình ảnh không được hỗ trợ: '{fmt}'")
+    out = BytesIO()
+    img.save(out, format=pil_format, **({} if pil_format == "PNG" else {"quality": quality}))
+    return out.getvalue()
+
+def tile_cache_format(fmt: str, col: int, row: int, tile_size: int = TILE_SIZE) -> str:
+    """
+    Tạo phần định dạng của khóa bộ nhớ đệm cho một ô của trang.
+    """
+    return f"{image_cache_format(fmt)}:tile{tile_size}:{col},{row}"
+
+def encode_pixmap(pix, fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> bytes:
+    """
+    Mã hóa một pixmap thành hình ảnh theo định dạng yêu cầu.
+
+    Args:
+        pix (fitz.Pixmap): Pixmap của trang.
+        fmt (str): "png", "jpeg" hoặc "webp".
+        quality (int): Chất lượng (1–100) cho JPEG và WebP.
+
+    Returns:
+        bytes: Dữ liệu hình ảnh đã mã hóa.
+    """
+    fmt = fmt.lower()
+    with timing.span("encode"):
+        if fmt == "png":
+            return pix.tobytes("png")
+        if fmt in ("jpeg", "jpg"):
+            return pix.tobytes("jpeg", jpg_quality=quality)
+        if fmt == "webp":
+            # MuPDF không tự mã hóa WebP nên dùng Pillow (đã có sẵn cùng Streamlit)
+            return pix.pil_tobytes(format="WEBP", quality=quality)
+    raise ValueError(f"Định dạng hình ảnh không được hỗ trợ: '{fmt}'")
+
+def pymupdf_render_page_as_image(pdf_path: str, page_number: int = 0, zoom: float = 1.5, use_cache: bool = True, cache: RenderCache = None, fmt: str = IMAGE_FORMAT) -> bytes:
+    """
+    Chuyển đổi một trang cụ thể của PDF thành hình ảnh (PNG, JPEG hoặc WebP).
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_number (int): Số trang để chuyển đổi thành hình ảnh (chỉ số bắt đầu từ 0).
+        zoom (float): Hệ số phóng đại để điều chỉnh độ phân giải hình ảnh.
+        use_cache (bool): Đọc/ghi bộ nhớ đệm hình ảnh trên đĩa.
+        cache (RenderCache): Bộ nhớ đệm cần dùng (mặc định là get_render_cache()).
+        fmt (str): Định dạng hình ảnh đầu ra.
+
+    Returns:
+        bytes: Dữ liệu hình ảnh của trang đã chuyển đổi.
+    """
+    cache_key = None
+    if use_cache:
+        try:
+            cache = cache or get_render_cache()
+            cache_key = RenderCache.make_key(file_content_hash(pdf_path), page_number, zoom, image_cache_format(fmt))
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        except OSError:
+            cache_key = None  # Bộ nhớ đệm không khả dụng, chuyển đổi trực tiếp
+
+    def render():
+        with document_pool.checkout(pdf_path) as doc:
+            page = load_checked_page(doc, pdf_path, page_number)
+            mat = fitz.Matrix(zoom, zoom)  # Điều chỉnh phóng đại để thay đổi độ phân giải
+            with timing.span("get_pixmap"):
+                pix = page.get_pixmap(matrix=mat)
+            img_bytes = encode_pixmap(pix, fmt)
+        if cache_key is not None:
+            try:
+                cache.put(cache_key, img_bytes)
+            except OSError:
+                pass  # Không ghi được bộ nhớ đệm thì vẫn trả về hình ảnh
+        return img_bytes
+
+    # Các phiên cùng yêu cầu (trang, thu phóng, định dạng) trong lúc đang chuyển đổi chờ chung một lần
+    flight_key = ("render", cache.cache_dir if cache_key else None, cache_key or render_request_key(pdf_path, page_number, zoom, fmt))
+    return single_flight.do(flight_key, render)
+
+def render_request_key(pdf_path: str, page_number: int, zoom: float, fmt: str) -> tuple:
+    """
+    Khóa của một yêu cầu chuyển đổi, dùng để gộp các yêu cầu giống hệt nhau đang chạy.
+    """
+    return (os.path.abspath(pdf_path), page_number, round(zoom, 3), fmt.lower())
+
+def get_cached_render(pdf_path: str, page_number: int, zoom: float, fmt: str = IMAGE_FORMAT,
+                      cache: RenderCache = None, tile: tuple = None):
+    """
+    Tra bộ nhớ đệm hình ảnh mà không chuyển đổi.
+
+    Args:
+        cache (RenderCache): Bộ nhớ đệm cần tra (mặc định là bộ nhớ đệm hình ảnh trang).
+        tile (tuple): (cột, hàng) nếu cần tra một ô thay vì cả trang.
+
+    Returns:
+        bytes hoặc None: Hình ảnh đã lưu, hoặc None nếu chưa có.
+    """
+    cache_format = image_cache_format(fmt) if tile is None else tile_cache_format(fmt, *tile)
+    try:
+        key = RenderCache.make_key(file_content_hash(pdf_path), page_number, zoom, cache_format)
+        return (cache or get_render_cache()).get(key)
+    except OSError:
+        return None
+
+def pymupdf_render_thumbnail(pdf_path: str, page_number: int = 0, fmt: str = IMAGE_FORMAT) -> bytes:
+    """
+    Chuyển đổi một trang thành ảnh thu nhỏ độ phân giải thấp (lưu vĩnh viễn trong bộ nhớ đệm riêng).
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_number (int): Số trang (chỉ số bắt đầu từ 0).
+        fmt (str): Định dạng hình ảnh đầu ra.
+
+    Returns:
+        bytes: Dữ liệu hình ảnh của ảnh thu nhỏ.
+    """
+    return pymupdf_render_page_as_image(pdf_path, page_number=page_number, zoom=THUMBNAIL_ZOOM, cache=get_thumbnail_cache(), fmt=fmt)
+
+def page_tile_grid(pdf_path: str, page_number: int, zoom: float, tile_size: int = TILE_SIZE):
+    """
+    Tính lưới ô của một trang ở mức thu phóng cho trước.
+
+    Returns:
+        tuple: (số cột, số hàng, chiều rộng điểm ảnh, chiều cao điểm ảnh).
+    """
+    with document_pool.checkout(pdf_path) as doc:
+        rect = doc.load_page(page_number).rect
+    width, height = int(rect.width * zoom + 0.5), int(rect.height * zoom + 0.5)
+    return -(-width // tile_size), -(-height // tile_size), width, height
+
+def pymupdf_render_tile(pdf_path: str, page_number: int, zoom: float, col: int, row: int,
+                        fmt: str = IMAGE_FORMAT, tile_size: int = TILE_SIZE) -> bytes:
+    """
+    Chuyển đổi một ô của trang bằng vùng cắt, nên bộ nhớ tối đa chỉ phụ thuộc kích thước ô.
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_number (int): Số trang (chỉ số bắt đầu từ 0).
+        zoom (float): Mức thu phóng.
+        col (int): Cột của ô (bắt đầu từ 0).
+        row (int): Hàng của ô (bắt đầu từ 0).
+        fmt (str): Định dạng hình ảnh đầu ra.
+        tile_size (int): Kích thước cạnh ô (điểm ảnh).
+
+    Returns:
+        bytes: Dữ liệu hình ảnh của ô.
+    """
+    cache = get_render_cache()
+    tile_format = tile_cache_format(fmt, col, row, tile_size)
+    try:
+        cache_key = RenderCache.make_key(file_content_hash(pdf_path), page_number, zoom, tile_format)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    except OSError:
+        cache_key = None
+
+    def render():
+        with document_pool.checkout(pdf_path) as doc:
+            page = load_checked_page(doc, pdf_path, page_number)
+            # Vùng của ô theo tọa độ trang PDF (điểm ảnh chia cho mức thu phóng)
+            clip = fitz.Rect(col * tile_size, row * tile_size, (col + 1) * tile_size, (row + 1) * tile_size) / zoom
+            clip &= page.rect
+            with timing.span("get_pixmap"):
+                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip)
+            img_bytes = encode_pixmap(pix, fmt)
+        if cache_key is not None:
+            try:
+                cache.put(cache_key, img_bytes)
+            except OSError:
+                pass
+        return img_bytes
+
+    return single_flight.do(("tile", render_request_key(pdf_path, page_number, zoom, tile_format)), render)
+
+def stitch_tiles(tiles, size: tuple, tile_size: int = TILE_SIZE, fmt: str = IMAGE_FORMAT) -> bytes:
+    """
+    Ghép các ô trong vùng xem thành một hình ảnh (chỉ lớn bằng vùng xem, không bằng cả trang).
+
+    Args:
+        tiles (dict): (cột, hàng tương đối trong vùng xem) -> dữ liệu hình ảnh của ô.
+        size (tuple): (chiều rộng, chiều cao) điểm ảnh của vùng xem, tính từ lưới ô của trang;
+            ô lỗi để lại vùng trắng thay vì làm hình bị cắt.
+
+    Returns:
+        bytes: Hình ảnh của vùng xem.
+    """
+    images = {}
+    for (col, row), data in tiles.items():
+        if data:
+            with Image.open(BytesIO(data)) as tile:
+                images[(col, row)] = tile.convert("RGB")
+    if not images:
+        return b""
+    canvas = Image.new("RGB", size, "white")
+    for (col, row), tile in images.items():
+        canvas.paste(tile, (col * tile_size, row * tile_size))
+    return encode_image(canvas, fmt)
+
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+def get_render_executor():
+    """
+    Trả về bể tiến trình chuyển đổi dùng chung (khởi tạo khi cần), hoặc None nếu chỉ dùng một tiến trình.
+
+    Dùng "spawn" thay vì "fork" vì máy chủ Streamlit có nhiều luồng, và mỗi tiến trình con
+    giữ bể tài liệu riêng (PyMuPDF không cho phép dùng chung tài liệu giữa các luồng/tiến trình).
+    """
+    global _render_executor
+    if RENDER_WORKERS <= 1:
+        return None
+    with _render_executor_lock:
+        if _render_executor is None:
+            _render_executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_render_executor.shutdown, wait=False, cancel_futures=True)
+        return _render_executor
+
+def _run_in_worker(fn, *args):
+    with timing.collect_spans() as spans:
+        result = fn(*args)
+    return result, spans
+
+class _WorkerFuture(Future):
+    """
+    Future bên ngoài của một công việc trong bể tiến trình: chỉ hủy được khi công việc bên trong
+    hủy được (còn trong hàng đợi), để số yêu cầu bị hủy phản ánh đúng công việc đã được rút lại.
+    """
+
+    def __init__(self, inner: Future):
+        super().__init__()
+        self._inner = inner
+
+    def cancel(self) -> bool:
+        if not self._inner.cancel():
+            return False  # Đã chạy trong tiến trình con: để chạy hết và lưu vào bộ nhớ đệm
+        return super().cancel()
+
+def _record_worker_spans(inner: Future) -> Future:
+    """
+    Chuyển kết quả (dữ liệu, khoảng đo) của tiến trình con thành Future chỉ chứa dữ liệu,
+    và ghi các khoảng đo vào lần chạy lại đã gửi yêu cầu.
+    """
+    rerun = timing.current_rerun()
+    page = timing.current_page()
+    outer = _WorkerFuture(inner)
+
+    def done(future):
+        if future.cancelled() or outer.done():
+            return  # Đã bị hủy (Future bên ngoài được hủy trong _WorkerFuture.cancel)
+        try:
+            result, spans = future.result()
+        except BaseException as e:
+            try:
+                outer.set_exception(e)
+            except InvalidStateError:
+                pass
+            return
+        timing.record_spans(spans, rerun=rerun, page=page)
+        try:
+            outer.set_result(result)
+        except InvalidStateError:
+            pass
+
+    inner.add_done_callback(done)
+    return outer
+
+_service_executor = None
+
+def get_service_executor() -> ThreadPoolExecutor:
+    """
+    Trả về bể luồng gửi yêu cầu tới dịch vụ chuyển đổi (chỉ chờ mạng, không giữ GIL).
+    """
+    global _service_executor
+    with _render_executor_lock:
+        if _service_executor is None:
+            _service_executor = ThreadPoolExecutor(max_workers=RENDER_SERVICE_CONNECTIONS, thread_name_prefix="pdfview-service")
+            atexit.register(_service_executor.shutdown, wait=False, cancel_futures=True)
+        return _service_executor
+
+def render_service_request(endpoint: str, **params) -> bytes:
+    """
+    Gọi một điểm cuối của dịch vụ chuyển đổi.
+
+    Args:
+        endpoint (str): "render", "tile" hoặc "text".
+        **params: Tham số truy vấn (path, page, zoom, ...).
+
+    Returns:
+        bytes: Nội dung phản hồi.
+
+    Raises:
+        OSError: Dịch vụ không phản hồi hoặc trả về lỗi (urllib.error.URLError/HTTPError).
+    """
+    url = f"{RENDER_SERVICE_URL}/{endpoint}?{urlencode(params)}"
+    with urllib.request.urlopen(url, timeout=RENDER_SERVICE_TIMEOUT) as response:
+        return response.read()
+
+def submit_service_request(endpoint: str, fallback, **params) -> Future:
+    """
+    Gửi yêu cầu tới dịch vụ chuyển đổi mà không chặn luồng script.
+
+    Args:
+        endpoint (str): Điểm cuối của dịch vụ.
+        fallback (callable): Hàm xử lý ngay trong tiến trình nếu dịch vụ không khả dụng.
+        **params: Tham số truy vấn.
+
+    Returns:
+        Future: Kết quả là nội dung phản hồi (hoặc kết quả của fallback).
+    """
+    rerun = timing.current_rerun()
+    page = timing.current_page()
+
+    def call():
+        started = time.perf_counter()
+        try:
+            data = render_service_request(endpoint, **params)
+        except OSError:
+            return fallback()
+        timing.record("render_service", time.perf_counter() - started, page=page, rerun=rerun)
+        return data
+
+    return get_service_executor().submit(call)
+
+def _run_inline(fn) -> Future:
+    """
+    Chạy fn() ngay trên luồng hiện tại và trả về Future đã xong (kết quả hoặc ngoại lệ).
+    """
+    future = Future()
+    try:
+        future.set_result(fn())
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def _submit(kind: str, cache_lookup, job: tuple, service_params: dict) -> Future:
+    """
+    Gửi một công việc chuyển đổi: dữ liệu đã có trong bộ nhớ đệm được trả về ngay, ngược lại công việc
+    được gửi tới dịch vụ chuyển đổi (nếu được cấu hình), bể tiến trình, hoặc chuyển đổi trực tiếp.
+
+    Args:
+        kind (str): Loại công việc, cũng là điểm cuối của dịch vụ ("render", "thumbnail", "tile").
+        cache_lookup (callable): Hàm tra bộ nhớ đệm, trả về dữ liệu hoặc None.
+        job (tuple): (hàm chuyển đổi, *tham số); hàm phải gửi được sang tiến trình con.
+        service_params (dict): Tham số truy vấn gửi tới dịch vụ.
+
+    Returns:
+        Future: Kết quả là dữ liệu hình ảnh (hoặc ngoại lệ nếu lỗi).
+    """
+    cached = cache_lookup()
+    if cached is not None:
+        return _run_inline(lambda: cached)
+    fn, *args = job
+    flight_key = ("submit", kind, tuple(sorted(service_params.items())))
+    if RENDER_SERVICE_URL:
+        return single_flight.submit(flight_key, lambda: submit_service_request(kind, lambda: fn(*args), **service_params))
+    executor = get_render_executor()
+    if executor is not None:
+        try:
+            return single_flight.submit(flight_key, lambda: _record_worker_spans(executor.submit(_run_in_worker, fn, *args)))
+        except RuntimeError:
+            pass  # Bể tiến trình đã hỏng hoặc đóng: chuyển đổi trực tiếp
+    return _run_inline(lambda: fn(*args))
+
+def submit_page_render(pdf_path: str, page_number: int, zoom: float, fmt: str = IMAGE_FORMAT) -> Future:
+    """
+    Gửi yêu cầu chuyển đổi một trang tới dịch vụ chuyển đổi (nếu được cấu hình) hoặc bể tiến trình.
+
+    Trang đã có trong bộ nhớ đệm được trả về ngay (không qua tiến trình con); nếu không có
+    bể tiến trình, trang được chuyển đổi trực tiếp.
+
+    Returns:
+        Future: Kết quả là dữ liệu hình ảnh (hoặc ngoại lệ nếu lỗi).
+    """
+    return _submit(
+        "render",
+        lambda: get_cached_render(pdf_path, page_number, zoom, fmt),
+        (partial(pymupdf_render_page_as_image, zoom=zoom, fmt=fmt), pdf_path, page_number),
+        dict(path=os.path.abspath(pdf_path), page=page_number, zoom=zoom, fmt=fmt),
+    )
+
+def submit_thumbnail_render(pdf_path: str, page_number: int, fmt: str = IMAGE_FORMAT) -> Future:
+    """
+    Gửi yêu cầu chuyển đổi ảnh thu nhỏ tới dịch vụ chuyển đổi hoặc bể tiến trình, như submit_page_render,
+    để luồng script không phải chuyển đổi trang trong lúc các tiến trình con đang rảnh.
+
+    Returns:
+        Future: Kết quả là dữ liệu hình ảnh của ảnh thu nhỏ (hoặc ngoại lệ nếu lỗi).
+    """
+    return _submit(
+        "thumbnail",
+        lambda: get_cached_render(pdf_path, page_number, THUMBNAIL_ZOOM, fmt, cache=get_thumbnail_cache()),
+        (pymupdf_render_thumbnail, pdf_path, page_number, fmt),
+        dict(path=os.path.abspath(pdf_path), page=page_number, fmt=fmt),
+    )
+
+def submit_tile_render(pdf_path: str, page_number: int, zoom: float, col: int, row: int, fmt: str = IMAGE_FORMAT) -> Future:
+    """
+    Gửi yêu cầu chuyển đổi một ô tới dịch vụ chuyển đổi hoặc bể tiến trình, như submit_page_render.
+
+    Returns:
+        Future: Kết quả là dữ liệu hình ảnh của ô.
+    """
+    return _submit(
+        "tile",
+        lambda: get_cached_render(pdf_path, page_number, zoom, fmt, tile=(col, row)),
+        (pymupdf_render_tile, pdf_path, page_number, zoom, col, row, fmt),
+        dict(path=os.path.abspath(pdf_path), page=page_number, zoom=zoom, col=col, row=row, fmt=fmt),
+    )
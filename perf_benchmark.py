@@ -0,0 +1,216 @@
+"""
+Bộ đo hiệu năng ngoại tuyến trên dữ liệu thật trong data/: chuyển đổi trang, trích xuất văn bản
+và chạy lại toàn bộ main() của ứng dụng.
+
+Mỗi kịch bản chạy trong một tiến trình riêng để bộ nhớ tối đa (peak RSS) không lẫn giữa các kịch bản,
+với mọi bộ nhớ đệm trên đĩa trỏ vào một thư mục tạm mới (không đọc hay ghi vào .cache đang dùng).
+Kết quả được ghi ra JSON và có thể so sánh với một lần đo trước để phát hiện suy giảm:
+
+    python perf_benchmark.py --zoom 1.5 3.0 --format png webp --output bench.json
+    python perf_benchmark.py --compare bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import pdf_engine
+import viewer
+
+# Các biến môi trường chỉ đường dẫn bộ nhớ đệm trên đĩa, và tên tương ứng trong thư mục tạm
+CACHE_PATH_SETTINGS = (
+    ("PDFVIEW_RENDER_CACHE_DIR", "render"),
+    ("PDFVIEW_THUMBNAIL_CACHE_DIR", "thumbnails"),
+    ("PDFVIEW_LAYOUT_CACHE_DIR", "layout"),
+    ("PDFVIEW_SEARCH_INDEX_PATH", "search_index.json"),
+    ("PDFVIEW_MANIFEST_PATH", "manifest.json"),
+    ("PDFVIEW_TEXT_STORE_PATH", "page_text.bin"),
+)
+
+def percentile(values, pct: float) -> float:
+    """
+    Tính phân vị (nội suy tuyến tính) của một danh sách giá trị.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+def summarize(latencies, total_bytes: int = 0) -> dict:
+    total = sum(latencies)
+    return {
+        'count': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'pages_per_s': len(latencies) / total if total else 0.0,
+        'bytes': total_bytes,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def page_sources(data_dir: str, backend: str, limit: int):
+    pages = viewer.get_all_page_numbers(viewer.parse_data_detail("data_detail.txt"))
+    if limit:
+        pages = pages[:limit]
+    return [viewer.resolve_page_source(data_dir, page_num, backend) for page_num in pages]
+
+def bench_render(data_dir: str, backend: str, zoom: float, fmt: str, limit: int) -> dict:
+    latencies, total_bytes = [], 0
+    for pdf_path, page_index in page_sources(data_dir, backend, limit):
+        started = time.perf_counter()
+        img_bytes = pdf_engine.pymupdf_render_page_as_image(pdf_path, page_number=page_index, zoom=zoom, use_cache=False, fmt=fmt)
+        latencies.append(time.perf_counter() - started)
+        total_bytes += len(img_bytes)
+    return summarize(latencies, total_bytes)
+
+def bench_extract(data_dir: str, backend: str, limit: int) -> dict:
+    latencies, total_bytes = [], 0
+    for pdf_path, page_index in page_sources(data_dir, backend, limit):
+        started = time.perf_counter()
+        text = pdf_engine.pymupdf_parse_page(pdf_path, page_number=page_index, limit=None)
+        latencies.append(time.perf_counter() - started)
+        total_bytes += len(text.encode('utf-8'))
+    return summarize(latencies, total_bytes)
+
+def bench_rerun(reruns: int, warm: bool) -> dict:
+    """
+    Đo main() qua bộ kiểm thử của Streamlit, bắt đầu với bộ nhớ đệm rỗng.
+
+    Args:
+        reruns (int): Số lần chạy được đo.
+        warm (bool): False: chỉ đo lần chạy đầu tiên (lạnh); True: chạy một lần không đo rồi đo các lần chạy lại.
+    """
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file("web.py", default_timeout=600)
+    if warm:
+        app.run()
+    latencies = []
+    for _ in range(reruns if warm else 1):
+        started = time.perf_counter()
+        app.run()
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+SCENARIOS = {
+    'render': bench_render,
+    'extract': bench_extract,
+    'rerun': bench_rerun,
+}
+
+def _run_scenario(name: str, kwargs: dict, queue):
+    queue.put(SCENARIOS[name](**kwargs))
+
+@contextmanager
+def isolated_cache_env():
+    """
+    Trỏ mọi đường dẫn bộ nhớ đệm vào một thư mục tạm mới (cho tiến trình con tạo trong khối), rồi khôi phục và xóa nó.
+    """
+    cache_root = tempfile.mkdtemp(prefix="pdfview-bench-")
+    saved = {name: os.environ.get(name) for name, _ in CACHE_PATH_SETTINGS}
+    try:
+        for name, relative in CACHE_PATH_SETTINGS:
+            os.environ[name] = os.path.join(cache_root, relative)
+        yield cache_root
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(cache_root, ignore_errors=True)
+
+def run_isolated(name: str, **kwargs) -> dict:
+    """
+    Chạy một kịch bản trong tiến trình mới (spawn) với bộ nhớ đệm riêng, trống, và trả về kết quả của nó.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    with isolated_cache_env():
+        process = ctx.Process(target=_run_scenario, args=(name, kwargs, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+    return result
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """
+    So sánh hai lần đo; trả về các kịch bản có p50 hoặc p95 chậm hơn quá ngưỡng.
+
+    Returns:
+        list of str: Mô tả các suy giảm.
+    """
+    regressions = []
+    for key, result in current['results'].items():
+        old = baseline.get('results', {}).get(key)
+        if not old:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if old[metric] and result[metric] > old[metric] * (1 + threshold):
+                regressions.append(f"{key}: {metric} {old[metric]:.1f} -> {result[metric]:.1f} ms")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo hiệu năng chuyển đổi, trích xuất và chạy lại ứng dụng.")
+    parser.add_argument("--data-dir", default="./data", help="Thư mục dữ liệu.")
+    parser.add_argument("--zoom", type=float, nargs="+", default=[1.0, 1.5, 3.0], help="Các mức thu phóng.")
+    parser.add_argument("--format", nargs="+", default=list(pdf_engine.IMAGE_FORMATS), choices=pdf_engine.IMAGE_FORMATS, help="Các định dạng hình ảnh.")
+    parser.add_argument("--backend", nargs="+", default=["split", "book"], choices=["split", "book"], help="Các nguồn lưu trữ trang.")
+    parser.add_argument("--pages", type=int, default=0, help="Chỉ đo N trang đầu (0 = tất cả).")
+    parser.add_argument("--reruns", type=int, default=5, help="Số lần chạy lại main() được đo khi đã ấm (0 = bỏ qua đo chạy lại).")
+    parser.add_argument("--output", default="bench_results.json", help="Tệp JSON kết quả.")
+    parser.add_argument("--compare", help="Tệp JSON của lần đo trước để so sánh.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Ngưỡng suy giảm cho phép (0.10 = 10%%).")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for backend in args.backend:
+        key = f"extract/{backend}"
+        results[key] = run_isolated('extract', data_dir=args.data_dir, backend=backend, limit=args.pages)
+        print(f"{key:<28} p50 {results[key]['p50_ms']:8.1f} ms  {results[key]['pages_per_s']:7.1f} trang/s")
+        for zoom in args.zoom:
+            for fmt in args.format:
+                key = f"render/{backend}/x{zoom}/{fmt}"
+                results[key] = run_isolated('render', data_dir=args.data_dir, backend=backend, zoom=zoom, fmt=fmt, limit=args.pages)
+                r = results[key]
+                print(f"{key:<28} p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  "
+                      f"{r['pages_per_s']:6.1f} trang/s  {r['bytes'] / 1024 / 1024:7.1f} MB  RSS {r['peak_rss_mb']:.0f} MB")
+    if args.reruns:
+        results['rerun/cold'] = run_isolated('rerun', reruns=1, warm=False)
+        results['rerun/warm'] = run_isolated('rerun', reruns=args.reruns, warm=True)
+        print(f"{'rerun/cold':<28} {results['rerun/cold']['p50_ms']:8.1f} ms (lần chạy đầu, bộ nhớ đệm rỗng)")
+        print(f"{'rerun/warm':<28} p50 {results['rerun/warm']['p50_ms']:8.1f} ms  p95 {results['rerun/warm']['p95_ms']:8.1f} ms")
+
+    report = {
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Đã ghi kết quả vào '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for line in regressions:
+            print(f"Suy giảm: {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+"""
+Chuyển đổi trước toàn bộ các trang trong data_detail.txt vào bộ nhớ đệm hình ảnh.
+
+Chạy một lần khi triển khai để những người xem đầu tiên không phải chờ chuyển đổi:
+
+    python prerender.py --zoom 1.0 1.5 2.0 2.5 3.0 --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pdf_engine
+import viewer
+
+# Các mức thu phóng mặc định: thanh trượt 1.0–3.0 theo bước 0.5
+DEFAULT_ZOOMS = [1.0, 1.5, 2.0, 2.5, 3.0]
+
+def render_job(pdf_path: str, page_index: int, zoom) -> int:
+    """
+    Chuyển đổi một trang trong tiến trình con và ghi vào bộ nhớ đệm.
+
+    Args:
+        zoom: Mức thu phóng, hoặc None để tạo ảnh thu nhỏ.
+
+    Returns:
+        int: Kích thước hình ảnh.
+    """
+    if zoom is None:
+        return len(pdf_engine.pymupdf_render_thumbnail(pdf_path, page_number=page_index))
+    return len(pdf_engine.pymupdf_render_page_as_image(pdf_path, page_number=page_index, zoom=zoom))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chuyển đổi trước các trang PDF vào bộ nhớ đệm hình ảnh.")
+    parser.add_argument("--data-dir", default="./data", help="Thư mục dữ liệu.")
+    parser.add_argument("--detail", default="data_detail.txt", help="Đường dẫn đến data_detail.txt.")
+    parser.add_argument("--zoom", type=float, nargs="+", default=DEFAULT_ZOOMS, help="Các mức thu phóng cần chuyển đổi.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Số tiến trình chuyển đổi.")
+    parser.add_argument("--no-thumbnails", action="store_true", help="Không tạo ảnh thu nhỏ.")
+    parser.add_argument("--text-store", action="store_true", help="Trích xuất văn bản mọi trang vào kho văn bản.")
+    parser.add_argument("--ocr", action="store_true", help="OCR các trang có ít văn bản và lưu vào kho văn bản (cần Tesseract).")
+    parser.add_argument("--layout", action="store_true", help="Trích xuất bố cục có cấu trúc của mọi trang.")
+    parser.add_argument("--search-index", action="store_true", help="Cập nhật cả chỉ mục tìm kiếm toàn văn.")
+    parser.add_argument("--backend", choices=["book", "split"], default=viewer.STORAGE_BACKEND, help="Nguồn lưu trữ trang.")
+    args = parser.parse_args(argv)
+
+    sections = viewer.parse_data_detail(args.detail)
+    if not sections:
+        parser.error(f"Không tìm thấy phần hợp lệ trong '{args.detail}'.")
+    backend = viewer.resolve_storage_backend(args.data_dir, args.backend)
+    pages = viewer.get_all_page_numbers(sections)
+
+    zooms = list(args.zoom) if args.no_thumbnails else [None] + list(args.zoom)
+    jobs = []
+    for page_num in pages:
+        pdf_path, page_index = viewer.resolve_page_source(args.data_dir, page_num, backend)
+        for zoom in zooms:
+            jobs.append((page_num, pdf_path, page_index, zoom))
+
+    print(f"Chuyển đổi {len(pages)} trang x {len(zooms)} mức thu phóng = {len(jobs)} hình ảnh ({backend}, {args.workers} tiến trình)")
+    started = time.perf_counter()
+    failed = 0
+    total_bytes = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(render_job, pdf_path, page_index, zoom): (page_num, zoom)
+                   for page_num, pdf_path, page_index, zoom in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            page_num, zoom = futures[future]
+            try:
+                size = future.result()
+            except Exception as e:
+                size = 0
+                print(f"Lỗi chuyển đổi trang {page_num} (x{zoom or 'thu nhỏ'}): {e}")
+            if size:
+                total_bytes += size
+            else:
+                failed += 1
+            if done % 50 == 0 or done == len(jobs):
+                print(f"  {done}/{len(jobs)}")
+
+    elapsed = time.perf_counter() - started
+    print(f"Hoàn tất sau {elapsed:.1f}s, {total_bytes / 1024 / 1024:.1f} MB, {failed} lỗi.")
+
+    if args.text_store:
+        extracted = viewer.build_page_text_store(args.data_dir, pages, backend)
+        print(f"Kho văn bản: trích xuất lại {extracted}/{len(pages)} trang.")
+
+    if args.ocr:
+        ocr_done, ocr_errors = viewer.run_ocr_pipeline(args.data_dir, pages, backend, workers=args.workers)
+        print(f"OCR: {len(ocr_done)} trang {ocr_done}, {len(ocr_errors)} lỗi.")
+        for page_num, message in sorted(ocr_errors.items()):
+            print(f"  Lỗi OCR trang {page_num}: {message}")
+        failed += len(ocr_errors)
+
+    if args.layout:
+        for page_num in pages:
+            pdf_path, page_index = viewer.resolve_page_source(args.data_dir, page_num, backend)
+            try:
+                pdf_engine.pymupdf_extract_layout(pdf_path, page_index)
+            except Exception as e:
+                failed += 1
+                print(f"Lỗi trích xuất bố cục trang {page_num}: {e}")
+        print(f"Bố cục: {len(pages)} trang.")
+
+    if args.search_index:
+        index = viewer.get_search_index(args.data_dir, pages, backend)
+        print(f"Chỉ mục tìm kiếm: {len(index)} trang, {len(index.postings)} từ tố.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
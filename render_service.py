@@ -0,0 +1,177 @@
+"""
+Dịch vụ chuyển đổi không giao diện: một tiến trình riêng nhận yêu cầu chuyển đổi/trích xuất qua HTTP cục bộ,
+xếp vào hàng đợi của bể tiến trình con và trả kết quả, tách hẳn việc xử lý PDF khỏi luồng chạy script Streamlit.
+
+Các yêu cầu giống hệt nhau đang được xử lý (cùng tệp, trang, thu phóng, định dạng) được gộp lại:
+mọi người dùng cùng chờ một lần chuyển đổi.
+
+    python render_service.py --port 8765 --workers 8
+    PDFVIEW_RENDER_SERVICE_URL=http://127.0.0.1:8765 streamlit run web.py
+
+Các điểm cuối (GET):
+    /render?path=&page=&zoom=&fmt=             hình ảnh một trang
+    /tile?path=&page=&zoom=&col=&row=&fmt=     hình ảnh một ô của trang
+    /thumbnail?path=&page=&fmt=                ảnh thu nhỏ của trang
+    /text?path=&page=                          văn bản UTF-8 của trang
+    /health                                    thống kê hàng đợi (JSON)
+"""
+import argparse
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pdf_engine
+
+CONTENT_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "jpg": "image/jpeg", "webp": "image/webp"}
+
+def render_job(pdf_path: str, page_index: int, zoom: float, fmt: str) -> bytes:
+    return pdf_engine.pymupdf_render_page_as_image(pdf_path, page_number=page_index, zoom=zoom, fmt=fmt)
+
+def tile_job(pdf_path: str, page_index: int, zoom: float, col: int, row: int, fmt: str) -> bytes:
+    return pdf_engine.pymupdf_render_tile(pdf_path, page_index, zoom, col, row, fmt)
+
+def thumbnail_job(pdf_path: str, page_index: int, fmt: str) -> bytes:
+    return pdf_engine.pymupdf_render_thumbnail(pdf_path, page_index, fmt)
+
+def text_job(pdf_path: str, page_index: int) -> bytes:
+    # Văn bản được giữ trong bộ đệm của tiến trình con, lỗi trích xuất được trả về thành 500
+    return pdf_engine.pymupdf_parse_page(pdf_path, page_index, limit=None).encode('utf-8')
+
+JOBS = {
+    'render': render_job,
+    'tile': tile_job,
+    'thumbnail': thumbnail_job,
+    'text': text_job,
+}
+
+class RenderService:
+    """
+    Hàng đợi công việc trên bể tiến trình con, gộp các yêu cầu giống hệt nhau đang được xử lý.
+    """
+
+    def __init__(self, data_dir: str, workers: int):
+        self.data_dir = os.path.realpath(data_dir)
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.flight = pdf_engine.SingleFlight()
+
+    def resolve_path(self, path: str) -> str:
+        """
+        Chỉ cho phép tệp nằm trong thư mục dữ liệu của dịch vụ.
+        """
+        real = os.path.realpath(path)
+        if os.path.commonpath([real, self.data_dir]) != self.data_dir or not os.path.isfile(real):
+            raise PermissionError(f"Tệp không thuộc thư mục dữ liệu: '{path}'")
+        return real
+
+    def page_count(self, pdf_path: str) -> int:
+        with pdf_engine.document_pool.checkout(pdf_path) as doc:
+            return doc.page_count
+
+    def submit(self, kind: str, *args):
+        """
+        Gửi một công việc, hoặc trả về công việc giống hệt đang chạy.
+
+        Returns:
+            Future: Kết quả là dữ liệu (bytes).
+        """
+        return self.flight.submit((kind, *args), lambda: self.executor.submit(JOBS[kind], *args))
+
+    def stats(self) -> dict:
+        stats = self.flight.stats()
+        return {'requests': stats['leaders'] + stats['shared'], 'coalesced': stats['shared'], 'inflight': stats['inflight']}
+
+def make_handler(service: RenderService):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                self._send(200, json.dumps(service.stats()).encode('utf-8'), "application/json")
+                return
+            kind = url.path.strip("/")
+            if kind not in JOBS:
+                self.send_error(404)
+                return
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+            try:
+                pdf_path = service.resolve_path(params['path'])
+                page_index = int(params['page'])
+                fmt = params.get('fmt', pdf_engine.IMAGE_FORMAT).lower()
+                if fmt not in pdf_engine.IMAGE_FORMATS:
+                    raise ValueError(f"định dạng '{fmt}' không được hỗ trợ")
+                if kind == 'render':
+                    args = (pdf_path, page_index, float(params['zoom']), fmt)
+                elif kind == 'tile':
+                    args = (pdf_path, page_index, float(params['zoom']), int(params['col']), int(params['row']), fmt)
+                elif kind == 'thumbnail':
+                    args = (pdf_path, page_index, fmt)
+                else:
+                    args = (pdf_path, page_index)
+                if kind in ('render', 'tile') and not args[2] > 0:
+                    raise ValueError("zoom phải lớn hơn 0")
+            except PermissionError as e:
+                self.send_error(403, explain=str(e))
+                return
+            except (KeyError, ValueError) as e:
+                self.send_error(400, explain=f"Tham số không hợp lệ: {e}")
+                return
+            try:
+                page_count = service.page_count(pdf_path)
+            except Exception as e:
+                self.send_error(500, explain=f"Không thể mở tệp PDF: {e}")
+                return
+            if not 0 <= page_index < page_count:
+                self.send_error(404, explain=f"Số trang {page_index} ngoài phạm vi 0–{page_count - 1}")
+                return
+            if kind == 'tile':
+                zoom, col, row = args[2:5]
+                cols, rows, _, _ = pdf_engine.page_tile_grid(pdf_path, page_index, zoom)
+                if not (0 <= col < cols and 0 <= row < rows):
+                    self.send_error(404, explain=f"Ô ({col}, {row}) ngoài lưới {cols}×{rows} của trang")
+                    return
+            try:
+                data = service.submit(kind, *args).result()
+            except Exception as e:
+                self.send_error(500, explain=str(e))
+                return
+            if kind != 'text' and not data:
+                self.send_error(500, explain="Chuyển đổi thất bại")
+                return
+            content_type = "text/plain; charset=utf-8" if kind == 'text' else CONTENT_TYPES.get(fmt, "application/octet-stream")
+            self._send(200, data, content_type)
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dịch vụ chuyển đổi trang PDF chạy trong tiến trình riêng.")
+    parser.add_argument("--data-dir", default="./data", help="Thư mục dữ liệu (chỉ phục vụ tệp trong thư mục này).")
+    parser.add_argument("--host", default="127.0.0.1", help="Địa chỉ lắng nghe.")
+    parser.add_argument("--port", type=int, default=8765, help="Cổng lắng nghe.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Số tiến trình chuyển đổi.")
+    args = parser.parse_args(argv)
+
+    service = RenderService(args.data_dir, args.workers)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Dịch vụ chuyển đổi tại http://{args.host}:{args.port} ({args.workers} tiến trình, dữ liệu: {service.data_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.executor.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    main()
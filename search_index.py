@@ -0,0 +1,211 @@
+"""
+Chỉ mục tìm kiếm toàn văn (chỉ mục đảo) cho văn bản các trang, hỗ trợ tiếng Việt.
+
+Văn bản được gấp dấu (bỏ dấu thanh, dấu mũ, "đ" -> "d") và tách theo âm tiết, nên
+"dien bien phu" khớp với "Điện Biên Phủ". Kết quả được xếp hạng theo BM25.
+"""
+import json
+import math
+import os
+import re
+import tempfile
+import unicodedata
+from collections import Counter
+
+INDEX_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+_MARKDOWN_SPECIAL_RE = re.compile(r"([\\`*_{}\[\]()#+\-.!|<>$~])")
+_fold_memo = {}
+
+def fold_char(ch: str) -> str:
+    """
+    Gấp dấu một ký tự, luôn trả về đúng một ký tự để giữ nguyên vị trí trong chuỗi.
+    """
+    folded = _fold_memo.get(ch)
+    if folded is None:
+        if ch in "đĐ":
+            folded = "d"
+        else:
+            base = "".join(c for c in unicodedata.normalize("NFD", ch) if not unicodedata.combining(c))
+            folded = base.lower() if len(base) == 1 else ch.lower()[:1] or ch
+        _fold_memo[ch] = folded
+    return folded
+
+def fold_text(text: str) -> str:
+    """
+    Gấp dấu và chuyển về chữ thường; chuỗi kết quả có cùng độ dài với chuỗi NFC đầu vào.
+
+    Args:
+        text (str): Văn bản gốc.
+
+    Returns:
+        str: Văn bản đã gấp dấu.
+    """
+    return "".join(fold_char(c) for c in unicodedata.normalize("NFC", text))
+
+def escape_markdown(text: str) -> str:
+    """
+    Thoát các ký tự đặc biệt của Markdown để văn bản trang được hiển thị nguyên văn.
+    """
+    return _MARKDOWN_SPECIAL_RE.sub(r"\\\1", text)
+
+def tokenize(text: str):
+    """
+    Tách văn bản thành các âm tiết đã gấp dấu.
+
+    Args:
+        text (str): Văn bản gốc.
+
+    Returns:
+        list of str: Các từ tố.
+    """
+    return _TOKEN_RE.findall(fold_text(text))
+
+class SearchIndex:
+    """
+    Chỉ mục đảo: từ tố -> {số trang: tần suất}, kèm văn bản gốc để tạo đoạn trích.
+
+    Mỗi trang lưu mã băm nguồn để khi cập nhật chỉ lập chỉ mục lại các trang đã đổi.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.doc_lengths = {}
+        self.page_hashes = {}
+        self.page_texts = {}
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def is_current(self, page_num: int, page_hash: str) -> bool:
+        return self.page_hashes.get(page_num) == page_hash
+
+    def add_page(self, page_num: int, text: str, page_hash: str):
+        self.remove_page(page_num)
+        text = unicodedata.normalize("NFC", text)
+        counts = Counter(tokenize(text))
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[page_num] = tf
+        self.doc_lengths[page_num] = sum(counts.values())
+        self.page_hashes[page_num] = page_hash
+        self.page_texts[page_num] = text
+
+    def remove_page(self, page_num: int):
+        if page_num not in self.doc_lengths:
+            return
+        for token in set(tokenize(self.page_texts[page_num])):
+            pages = self.postings.get(token)
+            if pages is not None:
+                pages.pop(page_num, None)
+                if not pages:
+                    del self.postings[token]
+        del self.doc_lengths[page_num]
+        self.page_hashes.pop(page_num, None)
+        self.page_texts.pop(page_num, None)
+
+    def remove_source(self, source_hash: str):
+        """
+        Xóa mọi trang được lập chỉ mục từ một phiên bản tệp nguồn (mã băm trang có dạng "<mã băm tệp>:<chỉ số>").
+
+        Returns:
+            list of int: Các số trang đã xóa.
+        """
+        stale = [page_num for page_num, page_hash in self.page_hashes.items() if page_hash.split(':', 1)[0] == source_hash]
+        for page_num in stale:
+            self.remove_page(page_num)
+        return stale
+
+    def search(self, query: str, limit: int = 20, snippet_chars: int = 160):
+        """
+        Tìm các trang khớp với truy vấn, xếp hạng theo BM25.
+
+        Args:
+            query (str): Chuỗi tìm kiếm (có hoặc không dấu).
+            limit (int): Số kết quả tối đa.
+            snippet_chars (int): Độ dài đoạn trích.
+
+        Returns:
+            list of dict: Mỗi dict chứa 'page', 'score' và 'snippet'.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_lengths:
+            return []
+        n_docs = len(self.doc_lengths)
+        avg_len = sum(self.doc_lengths.values()) / n_docs or 1
+        scores = {}
+        for term in terms:
+            pages = self.postings.get(term, {})
+            if not pages:
+                continue
+            idf = math.log(1 + (n_docs - len(pages) + 0.5) / (len(pages) + 0.5))
+            for page_num, tf in pages.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[page_num] / avg_len)
+                scores[page_num] = scores.get(page_num, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [
+            {'page': page_num, 'score': score, 'snippet': self.snippet(page_num, terms, snippet_chars)}
+            for page_num, score in ranked
+        ]
+
+    def snippet(self, page_num: int, terms, width: int = 160) -> str:
+        """
+        Cắt đoạn văn bản quanh lần xuất hiện đầu tiên của một từ khóa, in đậm các từ khóa.
+
+        Kết quả là Markdown: văn bản trang được thoát ký tự đặc biệt trước khi thêm dấu in đậm.
+        """
+        text = self.page_texts.get(page_num, "")
+        folded = fold_text(text)
+        pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\b")
+        first = pattern.search(folded)
+        center = first.start() if first else 0
+        start = max(0, center - width // 3)
+        end = min(len(text), start + width)
+        # Vị trí trong chuỗi gấp dấu trùng với chuỗi gốc nên có thể in đậm trực tiếp
+        parts = []
+        cursor = start
+        for match in pattern.finditer(folded, start, end):
+            parts.append(escape_markdown(text[cursor:match.start()]))
+            parts.append(f"**{escape_markdown(text[match.start():match.end()])}**")
+            cursor = match.end()
+        parts.append(escape_markdown(text[cursor:end]))
+        body = " ".join("".join(parts).split())
+        return ("…" if start > 0 else "") + body + ("…" if end < len(text) else "")
+
+    def to_dict(self) -> dict:
+        return {
+            'version': INDEX_VERSION,
+            'postings': self.postings,
+            'doc_lengths': self.doc_lengths,
+            'page_hashes': self.page_hashes,
+            'page_texts': self.page_texts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        index = cls()
+        if data.get('version') != INDEX_VERSION:
+            return index
+        # JSON chỉ có khóa chuỗi nên đổi số trang về int
+        index.postings = {token: {int(p): tf for p, tf in pages.items()} for token, pages in data['postings'].items()}
+        index.doc_lengths = {int(p): n for p, n in data['doc_lengths'].items()}
+        index.page_hashes = {int(p): h for p, h in data['page_hashes'].items()}
+        index.page_texts = {int(p): t for p, t in data['page_texts'].items()}
+        return index
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix='.')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError, KeyError):
+            return cls()
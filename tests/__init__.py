@@ -0,0 +1,25 @@
+"""
+Kiểm thử của ứng dụng. Mọi bộ nhớ đệm trên đĩa được chuyển vào một thư mục tạm
+(trước khi nhập viewer và pdf_engine), để không đọc hay ghi vào .cache đang dùng.
+
+    python -m unittest discover -s tests -t .
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_cache_root = tempfile.mkdtemp(prefix="pdfview-tests-")
+atexit.register(shutil.rmtree, _cache_root, ignore_errors=True)
+
+for name, relative in (
+    ("PDFVIEW_RENDER_CACHE_DIR", "render"),
+    ("PDFVIEW_THUMBNAIL_CACHE_DIR", "thumbnails"),
+    ("PDFVIEW_LAYOUT_CACHE_DIR", "layout"),
+    ("PDFVIEW_SEARCH_INDEX_PATH", "search_index.json"),
+    ("PDFVIEW_MANIFEST_PATH", "manifest.json"),
+    ("PDFVIEW_TEXT_STORE_PATH", "page_text.bin"),
+):
+    os.environ[name] = os.path.join(_cache_root, relative)
+os.environ["PDFVIEW_RENDER_WORKERS"] = "1"
+os.environ["PDFVIEW_METRICS_PORT"] = "0"
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import fitz
+from streamlit.testing.v1 import AppTest
+
+from viewer import SectionTree, find_section_for_page, parse_pdf_outline
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web.py")
+
+def write_book(path: str):
+    """
+    Sách 8 trang, hai chương, mỗi chương kết thúc bằng một mục "Bài tập".
+    """
+    doc = fitz.open()
+    for i in range(8):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+    doc.set_toc([
+        [1, "Chương 1", 1],
+        [2, "Lý thuyết", 1],
+        [2, "Bài tập", 3],
+        [1, "Chương 2", 5],
+        [2, "Lý thuyết", 5],
+        [2, "Bài tập", 7],
+    ])
+    doc.save(path)
+    doc.close()
+
+class OutlineSectionsTest(unittest.TestCase):
+    """
+    Tên mục lặp lại giữa các chương phải dẫn tới đúng chương của nó.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        os.makedirs(os.path.join(self.directory, "data"))
+        self.book_path = os.path.join(self.directory, "data", "data.pdf")
+        write_book(self.book_path)
+
+    def test_repeated_titles_map_to_their_chapter(self):
+        tree = SectionTree(parse_pdf_outline(self.book_path))
+        chapter_two = tree.roots[1]
+        self.assertEqual(chapter_two['name'], "Chương 2")
+        exercises = tree.children_of(chapter_two['id'])[1]
+        self.assertEqual((exercises['name'], exercises['start'], exercises['end']), ("Bài tập", 7, 8))
+        self.assertEqual(tree.parent_of(exercises['id'])['id'], chapter_two['id'])
+        self.assertEqual(find_section_for_page(tree, 8), (chapter_two['id'], exercises['id']))
+        self.assertEqual(find_section_for_page(tree, 4), (tree.roots[0]['id'], tree.children_of(tree.roots[0]['id'])[1]['id']))
+
+    def test_selectbox_picks_the_chosen_chapter(self):
+        tree = SectionTree(parse_pdf_outline(self.book_path))
+        chapter_two = tree.roots[1]
+        exercises = tree.children_of(chapter_two['id'])[1]
+        cwd = os.getcwd()
+        os.chdir(self.directory)
+        self.addCleanup(os.chdir, cwd)
+        at = AppTest.from_file(APP_PATH, default_timeout=120)
+        at.run()
+        self.assertFalse(at.exception)
+        self.assertEqual(at.sidebar.selectbox(key="main_section").options, ["Chương 1", "Chương 2"])
+
+        # Hộp chọn giữ định danh phần, chỉ hiển thị tên
+        at.sidebar.selectbox(key="main_section").select(chapter_two['id']).run()
+        self.assertEqual(at.sidebar.selectbox(key="sub_section").options, ["Chương 2", "Lý thuyết", "Bài tập"])
+        at.sidebar.selectbox(key="sub_section").select(exercises['id']).run()
+        self.assertFalse(at.exception)
+        self.assertEqual(at.header[0].value, "📄 Bài tập")
+        self.assertEqual([expander.label for expander in at.expander], ["📄 Trang 7", "📄 Trang 8"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import zlib
+
+import fitz
+
+from page_layout import ARRAY_FIELDS, PageLayout, extract_layout
+
+def two_column_page():
+    doc = fitz.open()
+    page = doc.new_page(width=600, height=800)
+    page.insert_text((320, 100), "Right column line one")
+    page.insert_text((40, 300), "Left column line two")
+    page.insert_text((40, 100), "Left column line one")
+    return doc, page
+
+class PageLayoutTest(unittest.TestCase):
+    def test_round_trip(self):
+        doc, page = two_column_page()
+        layout = extract_layout(page)
+        restored = PageLayout.from_bytes(layout.to_bytes())
+        for name, _, _ in ARRAY_FIELDS:
+            self.assertEqual(getattr(restored, name), getattr(layout, name), name)
+        self.assertEqual((restored.width, restored.height), (layout.width, layout.height))
+        self.assertEqual(restored.fonts, layout.fonts)
+        self.assertEqual(restored.span_text, layout.span_text)
+        self.assertEqual(restored.words(), layout.words())
+        self.assertEqual(restored.nbytes, layout.nbytes)
+        doc.close()
+
+    def test_empty_round_trip(self):
+        restored = PageLayout.from_bytes(PageLayout(10, 20).to_bytes())
+        self.assertEqual(restored.word_count, 0)
+        self.assertEqual(restored.text_in_reading_order(), "")
+
+    def test_unsupported_version(self):
+        raw = zlib.decompress(PageLayout().to_bytes()).replace(b'"version": 1', b'"version": 2')
+        with self.assertRaises(ValueError):
+            PageLayout.from_bytes(zlib.compress(raw))
+
+    def test_text_in_reading_order_reads_columns(self):
+        doc, page = two_column_page()
+        text = extract_layout(page).text_in_reading_order()
+        self.assertEqual(text.splitlines(), ["Left column line one", "Left column line two", "Right column line one"])
+        doc.close()
+
+if __name__ == "__main__":
+    unittest.main()
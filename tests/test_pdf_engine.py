@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+import zlib
+
+import fitz
+
+import pdf_engine
+from pdf_engine import LAYOUT_FORMAT, RenderCache, file_content_hash, get_layout_cache, pymupdf_extract_layout
+
+class LayoutCacheTest(unittest.TestCase):
+    """
+    Bố cục lưu trên đĩa bị hỏng phải được phân tích lại thay vì làm lỗi trang.
+    """
+
+    def setUp(self):
+        handle, self.pdf_path = tempfile.mkstemp(suffix=".pdf")
+        os.close(handle)
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Layout cache test")
+        doc.save(self.pdf_path)
+        doc.close()
+        self.addCleanup(os.remove, self.pdf_path)
+        self.disk_key = RenderCache.make_key(file_content_hash(self.pdf_path), 0, 0.0, LAYOUT_FORMAT)
+
+    def extract_with_blob(self, blob: bytes):
+        get_layout_cache().put(self.disk_key, blob)
+        pdf_engine.layout_cache.clear()
+        return pymupdf_extract_layout(self.pdf_path, 0)
+
+    def test_corrupt_blobs_fall_back_to_extraction(self):
+        for blob in (b"not zlib", zlib.compress(b"\x01"), zlib.compress(b"\xff\xff\x00\x00{")):
+            with self.subTest(blob=blob):
+                layout = self.extract_with_blob(blob)
+                self.assertIn("Layout", layout.text_in_reading_order())
+                # Bản lưu hỏng được thay bằng bố cục vừa phân tích
+                self.assertNotEqual(get_layout_cache().get(self.disk_key), blob)
+
+if __name__ == "__main__":
+    unittest.main()
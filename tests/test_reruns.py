@@ -0,0 +1,50 @@
+import atexit
+import os
+import sys
+import unittest
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web.py")
+
+def shared_state(viewer, engine) -> dict:
+    return {
+        'document_pool': engine.document_pool,
+        'text_cache': engine.text_cache,
+        'layout_cache': engine.layout_cache,
+        'highlight_cache': engine.highlight_cache,
+        'single_flight': engine.single_flight,
+        'file_hash_memo': engine._file_hash_memo,
+        'section_tree_memo': viewer._section_tree_memo,
+        'render_cache': engine.get_render_cache(),
+    }
+
+class RerunStateTest(unittest.TestCase):
+    """
+    Trạng thái dùng chung (bể tài liệu, bộ nhớ đệm, mã băm tệp...) phải được giữ giữa các lần chạy lại.
+    """
+
+    def test_shared_state_survives_reruns(self):
+        at = AppTest.from_file(APP_PATH, default_timeout=300)
+        at.run()
+        self.assertFalse(at.exception)
+        viewer, engine = sys.modules["viewer"], sys.modules["pdf_engine"]
+        before = shared_state(viewer, engine)
+        opened = viewer.timing.registry.snapshot()["fitz_open"]["count"]
+        exit_callbacks = atexit._ncallbacks()
+        self.assertTrue(engine._file_hash_memo)
+
+        at.sidebar.slider[0].set_value(1.1).run()
+        at.run()
+        self.assertFalse(at.exception)
+
+        self.assertIs(sys.modules["viewer"], viewer)
+        self.assertIs(sys.modules["pdf_engine"], engine)
+        for name, value in shared_state(viewer, engine).items():
+            self.assertIs(value, before[name], name)
+        self.assertEqual(viewer.timing.registry.snapshot()["fitz_open"]["count"], opened)
+        # Thân module không được chạy lại: không thêm hàm dọn dẹp mới ở mỗi lần chạy lại
+        self.assertEqual(atexit._ncallbacks(), exit_callbacks)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unicodedata
+import unittest
+
+from search_index import SearchIndex, escape_markdown, fold_text, tokenize
+
+class FoldingTest(unittest.TestCase):
+    def test_vietnamese_diacritics_are_folded(self):
+        self.assertEqual(tokenize("Điện Biên Phủ"), ["dien", "bien", "phu"])
+        self.assertEqual(tokenize("ĐƯỜNG Hồ Chí Minh"), ["duong", "ho", "chi", "minh"])
+        self.assertEqual(tokenize("Triều Lý, năm 1010."), ["trieu", "ly", "nam", "1010"])
+
+    def test_fold_text_preserves_length(self):
+        for text in ("Khởi nghĩa Lam Sơn", "Ếch ộp – đầm lầy!", "ﬁn", "İstanbul"):
+            with self.subTest(text=text):
+                self.assertEqual(len(fold_text(text)), len(unicodedata.normalize("NFC", text)))
+
+    def test_decomposed_input_matches_composed(self):
+        composed = "Thăng Long"
+        decomposed = unicodedata.normalize("NFD", composed)
+        self.assertNotEqual(len(decomposed), len(composed))
+        self.assertEqual(fold_text(decomposed), fold_text(composed))
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add_page(1, "Triều Lý dời đô về Thăng Long. " + "Lịch sử " * 20, "a:0")
+        self.index.add_page(2, "Thăng Long, Thăng Long, Thăng Long nghìn năm văn hiến.", "a:1")
+        self.index.add_page(3, "Chiến dịch Điện Biên Phủ năm 1954.", "a:2")
+
+    def test_query_without_diacritics_matches(self):
+        self.assertEqual([hit['page'] for hit in self.index.search("dien bien phu")], [3])
+
+    def test_bm25_prefers_frequent_term_in_short_page(self):
+        self.assertEqual([hit['page'] for hit in self.index.search("thang long")], [2, 1])
+
+    def test_rare_term_outweighs_common_term(self):
+        hits = self.index.search("nam dien")
+        self.assertEqual(hits[0]['page'], 3)
+
+    def test_updated_page_is_reindexed(self):
+        self.index.add_page(3, "Trang đã được thay thế.", "b:2")
+        self.assertEqual(self.index.search("bien"), [])
+        self.assertEqual([hit['page'] for hit in self.index.search("thay the")], [3])
+
+    def test_snippet_escapes_markdown_before_bolding(self):
+        self.index.add_page(4, "Giá *đặc biệt* [xem](http://x) #1 Điện_Biên", "a:3")
+        snippet = self.index.search("dac biet")[0]['snippet']
+        self.assertEqual(snippet, r"Giá \***đặc** **biệt**\* \[xem\]\(http://x\) \#1 Điện\_Biên")
+        self.assertEqual(escape_markdown("a_b"), r"a\_b")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from viewer import SectionTree
+
+class SectionTreeTest(unittest.TestCase):
+    def test_nesting_follows_page_ranges(self):
+        tree = SectionTree([
+            {'start': 1, 'end': 4, 'name': 'Phần I'},
+            {'start': 5, 'end': 20, 'name': 'Phần II'},
+            {'start': 5, 'end': 10, 'name': 'Chương 1'},
+            {'start': 11, 'end': 20, 'name': 'Chương 2'},
+            {'start': 12, 'end': 13, 'name': 'Mục 2.1'},
+        ])
+        self.assertEqual([section['name'] for section in tree.roots], ['Phần I', 'Phần II'])
+        self.assertEqual([section['name'] for section in tree.children_of(1)], ['Chương 1', 'Chương 2'])
+        self.assertEqual(tree.children_of(0), [])
+        self.assertEqual(tree.parent_of(4)['name'], 'Chương 2')
+        self.assertIsNone(tree.parent_of(1))
+
+    def test_child_with_parent_name_does_not_loop(self):
+        tree = SectionTree([
+            {'start': 1, 'end': 10, 'name': 'Giới thiệu'},
+            {'start': 1, 'end': 3, 'name': 'Giới thiệu'},
+        ])
+        self.assertEqual([section['id'] for section in tree.roots], [0])
+        self.assertEqual(tree.parent_of(1)['id'], 0)
+        self.assertEqual([section['id'] for section in tree.path_for_page(2)], [0, 1])
+        self.assertEqual([section['id'] for section in tree.path_for_page(5)], [0])
+
+    def test_repeated_names_resolve_to_their_own_chapter(self):
+        tree = SectionTree([
+            {'start': 1, 'end': 10, 'name': 'Chương 1'},
+            {'start': 9, 'end': 10, 'name': 'Bài tập'},
+            {'start': 11, 'end': 20, 'name': 'Chương 2'},
+            {'start': 19, 'end': 20, 'name': 'Bài tập'},
+        ])
+        self.assertEqual(tree.parent_of(1)['name'], 'Chương 1')
+        self.assertEqual(tree.parent_of(3)['name'], 'Chương 2')
+        self.assertEqual(tree.section_for_page(20)['id'], 3)
+        self.assertEqual(tree.get(3)['start'], 19)
+
+    def test_page_lookup(self):
+        tree = SectionTree([
+            {'start': 1, 'end': 4, 'name': 'Phần I'},
+            {'start': 5, 'end': 20, 'name': 'Phần II'},
+            {'start': 5, 'end': 10, 'name': 'Chương 1'},
+        ])
+        self.assertEqual([section['name'] for section in tree.path_for_page(7)], ['Phần II', 'Chương 1'])
+        self.assertEqual(tree.section_for_page(15)['name'], 'Phần II')
+        self.assertEqual(tree.section_for_page(3)['name'], 'Phần I')
+        self.assertIsNone(tree.section_for_page(21))
+        self.assertIsNone(tree.get(99))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import threading
+import unittest
+from concurrent.futures import Future
+
+from pdf_engine import SingleFlight
+
+class SingleFlightSubmitTest(unittest.TestCase):
+    """
+    Gửi bất đồng bộ: người chờ cùng khóa dùng chung một Future, chỉ hủy khi không còn ai chờ.
+    """
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.started = []
+
+    def start(self) -> Future:
+        future = Future()
+        self.started.append(future)
+        return future
+
+    def test_same_key_shares_future(self):
+        first = self.flight.submit("k", self.start)
+        second = self.flight.submit("k", self.start)
+        self.assertIs(first, second)
+        self.assertEqual(len(self.started), 1)
+        self.assertEqual(self.flight.stats(), {'leaders': 1, 'shared': 1, 'inflight': 1})
+
+    def test_release_cancels_only_after_last_waiter(self):
+        future = self.flight.submit("k", self.start)
+        self.flight.submit("k", self.start)
+        self.assertFalse(self.flight.release(future))
+        self.assertFalse(future.cancelled())
+        self.assertTrue(self.flight.release(future))
+        self.assertTrue(future.cancelled())
+        self.assertEqual(self.flight.stats()['inflight'], 0)
+
+    def test_new_submit_after_cancel_starts_again(self):
+        future = self.flight.submit("k", self.start)
+        self.flight.release(future)
+        again = self.flight.submit("k", self.start)
+        self.assertIsNot(again, future)
+        self.assertEqual(len(self.started), 2)
+
+    def test_running_future_is_not_cancelled(self):
+        future = self.flight.submit("k", self.start)
+        future.set_running_or_notify_cancel()
+        self.assertFalse(self.flight.release(future))
+        # Người đến sau vẫn nhận công việc đang chạy, và được đếm lại từ đầu
+        self.assertIs(self.flight.submit("k", self.start), future)
+        future.set_result(b"data")
+        self.assertEqual(self.flight.stats()['inflight'], 0)
+        self.assertIsNot(self.flight.submit("k", self.start), future)
+
+    def test_completed_future_is_forgotten(self):
+        future = self.flight.submit("k", self.start)
+        future.set_result(b"data")
+        self.assertFalse(self.flight.release(future))
+        self.assertEqual(self.flight._refs, {})
+        self.assertEqual(self.flight._calls, {})
+
+class SingleFlightDoTest(unittest.TestCase):
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        entered = threading.Event()
+        proceed = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            entered.set()
+            proceed.wait(5)
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+        leader.start()
+        entered.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        while flight.stats()['shared'] < 3:
+            threading.Event().wait(0.01)
+        proceed.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(results, ["result"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats(), {'leaders': 1, 'shared': 3, 'inflight': 0})
+
+    def test_exception_reaches_waiters_and_key_is_freed(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError("hỏng")
+
+        with self.assertRaises(ValueError):
+            flight.do("k", fail)
+        self.assertEqual(flight.do("k", lambda: 1), 1)
+
+    def test_control_flow_exception_is_not_shared(self):
+        flight = SingleFlight()
+        entered = threading.Event()
+        proceed = threading.Event()
+
+        class Stop(BaseException):
+            pass
+
+        def interrupted():
+            entered.set()
+            proceed.wait(5)
+            raise Stop()
+
+        raised = []
+
+        def leader():
+            try:
+                flight.do("k", interrupted)
+            except Stop:
+                raised.append(True)
+
+        results = []
+        thread = threading.Thread(target=leader)
+        thread.start()
+        entered.wait(5)
+        follower = threading.Thread(target=lambda: results.append(flight.do("k", lambda: "result")))
+        follower.start()
+        while flight.stats()['shared'] < 1:
+            threading.Event().wait(0.01)
+        proceed.set()
+        for t in (thread, follower):
+            t.join(5)
+
+        # Người chờ không nhận ngoại lệ của luồng dẫn đầu mà tự chạy lại công việc
+        self.assertEqual(raised, [True])
+        self.assertEqual(results, ["result"])
+        self.assertEqual(flight.stats()['inflight'], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from text_store import PageTextStore
+
+class PageTextStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "page_text.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_round_trip(self):
+        PageTextStore.write(self.path, {1: ("Trang một", "h1"), 3: ("Ba", "h3", "ocr")})
+        store = PageTextStore(self.path)
+        self.assertEqual(store.get(1), "Trang một")
+        self.assertEqual(store.get(3), "Ba")
+        self.assertEqual(store.method(3), "ocr")
+        self.assertEqual(store.source_hash(1), "h1")
+        self.assertIsNone(store.get(2))
+        store.close()
+
+    def test_missing_data_file_is_empty_store(self):
+        PageTextStore.write(self.path, {1: ("Trang một", "h1")})
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+        store = PageTextStore(self.path)
+        self.assertEqual(len(store), 0)
+        self.assertIsNone(store.get(1))
+
+    def test_rewrite_keeps_open_readers_and_removes_old_data(self):
+        PageTextStore.write(self.path, {1: ("cũ", "h1")})
+        old = PageTextStore(self.path)
+        PageTextStore.write(self.path, {1: ("mới", "h2")})
+        new = PageTextStore(self.path)
+        self.assertEqual(old.get(1), "cũ")
+        self.assertEqual(new.get(1), "mới")
+        old.close()
+        new.close()
+        self.assertEqual(len([name for name in os.listdir(self.directory) if not name.endswith(".json")]), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Kho văn bản trang gọn nhẹ: toàn bộ văn bản nối liền dạng UTF-8 trong một tệp, kèm chỉ mục vị trí.
+
+Đọc văn bản một trang chỉ là cắt một đoạn của tệp đã ánh xạ bộ nhớ (mmap), không cần mở PDF.
+
+    <path>.<mã>   văn bản UTF-8 của mọi trang nối liền nhau (mỗi lần ghi một tệp mới)
+    <path>.json   {"version": 1, "data": "<tên tệp dữ liệu>", "pages": {"<số trang>": [vị trí, độ dài byte, mã băm nguồn, cách lấy]}}
+
+Chỉ mục ghi tên tệp dữ liệu của nó, nên việc thay tệp chỉ mục là bước chuyển nguyên tử sang kho mới:
+người đọc không bao giờ ghép chỉ mục mới với dữ liệu cũ (hay ngược lại).
+
+"Cách lấy" là "text" (trích xuất từ lớp văn bản của PDF) hoặc "ocr" (nhận dạng ký tự quang học).
+"""
+import json
+import mmap
+import os
+import tempfile
+
+STORE_VERSION = 1
+
+class PageTextStore:
+    """
+    Kho văn bản chỉ đọc, ánh xạ bộ nhớ. Dùng PageTextStore.write để tạo hoặc ghi lại kho.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pages = {}
+        self._file = None
+        self._mmap = None
+        # Lần thử thứ hai: chỉ mục vừa được thay và tệp dữ liệu cũ vừa bị xóa giữa lúc đọc
+        for _ in range(2):
+            try:
+                with open(path + ".json", 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (FileNotFoundError, ValueError):
+                return
+            if index.get('version') != STORE_VERSION or 'data' not in index:
+                return
+            data_path = os.path.join(os.path.dirname(path), index['data'])
+            try:
+                self._file = open(data_path, 'rb')
+                break
+            except OSError:
+                continue
+        else:
+            return  # Thiếu tệp dữ liệu: coi như kho rỗng
+        self.pages = {int(p): tuple(entry) for p, entry in index['pages'].items()}
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __contains__(self, page_num: int) -> bool:
+        return page_num in self.pages
+
+    def __len__(self):
+        return len(self.pages)
+
+    def source_hash(self, page_num: int):
+        entry = self.pages.get(page_num)
+        return entry[2] if entry else None
+
+    def method(self, page_num: int):
+        entry = self.pages.get(page_num)
+        if not entry:
+            return None
+        return entry[3] if len(entry) > 3 else "text"
+
+    def entries(self) -> dict:
+        """
+        Trả về toàn bộ nội dung kho ở dạng dùng được cho PageTextStore.write.
+        """
+        return {page_num: (self.get(page_num), self.source_hash(page_num), self.method(page_num)) for page_num in self.pages}
+
+    def get(self, page_num: int, limit: int = None):
+        """
+        Đọc văn bản của một trang.
+
+        Args:
+            page_num (int): Số trang.
+            limit (int): Số ký tự tối đa trả về (None = toàn bộ).
+
+        Returns:
+            str hoặc None: Văn bản, hoặc None nếu trang không có trong kho.
+        """
+        entry = self.pages.get(page_num)
+        if entry is None:
+            return None
+        offset, length = entry[0], entry[1]
+        if self._mmap is None or length == 0:
+            return ""
+        if limit is not None:
+            # Một ký tự UTF-8 dài tối đa 4 byte: không cần giải mã phần nằm ngoài giới hạn hiển thị
+            length = min(length, limit * 4)
+            return self._mmap[offset:offset + length].decode('utf-8', errors='ignore')[:limit]
+        return self._mmap[offset:offset + length].decode('utf-8')
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def write(path: str, pages):
+        """
+        Ghi kho mới (thay thế nguyên tử kho cũ) rồi xóa các tệp dữ liệu cũ.
+
+        Args:
+            path (str): Đường dẫn tệp dữ liệu của kho.
+            pages (dict): Số trang -> (văn bản, mã băm nguồn) hoặc (văn bản, mã băm nguồn, cách lấy).
+        """
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        basename = os.path.basename(path)
+        index = {}
+        fd, data_path = tempfile.mkstemp(dir=directory, prefix=basename + '.')
+        with os.fdopen(fd, 'wb') as f:
+            offset = 0
+            for page_num in sorted(pages):
+                text, source_hash, *rest = pages[page_num]
+                data = text.encode('utf-8')
+                f.write(data)
+                index[str(page_num)] = [offset, len(data), source_hash, rest[0] if rest else "text"]
+                offset += len(data)
+        fd, tmp_index = tempfile.mkstemp(dir=directory, prefix='.')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': STORE_VERSION, 'data': os.path.basename(data_path), 'pages': index}, f)
+        os.replace(tmp_index, path + ".json")
+        # Người đọc cũ vẫn giữ mmap của tệp dữ liệu cũ; tệp đang được dùng (trên Windows) sẽ được xóa lần sau
+        for name in os.listdir(directory):
+            old = os.path.join(directory, name)
+            if (name == basename or name.startswith(basename + '.')) and name != basename + ".json" and old != data_path:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
@@ -0,0 +1,227 @@
+"""
+Đo thời gian các giai đoạn nóng (mở PDF, chuyển đổi, mã hóa, trích xuất văn bản, đọc tệp tải xuống,
+tuần tự hóa của Streamlit) bằng các khoảng đo nhẹ.
+
+Mỗi khoảng đo được cộng vào hai nơi:
+    - bảng tổng hợp toàn tiến trình (biểu đồ tần suất theo giai đoạn), xuất ở định dạng văn bản Prometheus;
+    - lần chạy lại hiện tại của phiên (nếu luồng đang ghi), để xem theo giai đoạn và theo trang.
+
+Các sự kiện không có thời gian (ví dụ yêu cầu chuyển đổi bị hủy) được đếm riêng bằng count().
+"""
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ngưỡng (giây) của biểu đồ tần suất
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class TimingRegistry:
+    """
+    Biểu đồ tần suất thời gian theo giai đoạn và bộ đếm sự kiện, dùng chung cho toàn tiến trình (an toàn đa luồng).
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(self.buckets)}
+            entry['count'] += 1
+            entry['sum'] += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+
+    def increment(self, event: str, amount: int = 1):
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + amount
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {stage: {**entry, 'buckets': list(entry['buckets'])} for stage, entry in self._stages.items()}
+
+    def to_prometheus(self, prefix: str = "pdfview") -> str:
+        """
+        Xuất biểu đồ tần suất và bộ đếm ở định dạng văn bản Prometheus.
+        """
+        name = f"{prefix}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Thời gian của từng giai đoạn xử lý trang.",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, entry in sorted(self.snapshot().items()):
+            for bound, count in zip(self.buckets, entry['buckets']):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {entry["count"]}')
+        for event, value in sorted(self.counters().items()):
+            counter = f"{prefix}_{event}_total"
+            lines.append(f"# TYPE {counter} counter")
+            lines.append(f"{counter} {value}")
+        return "\n".join(lines) + "\n"
+
+class RerunTimings:
+    """
+    Các khoảng đo của một lần chạy lại: danh sách (giai đoạn, số trang, giây).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, page=None):
+        with self._lock:
+            self.spans.append((stage, page, seconds))
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def by_stage(self) -> dict:
+        """
+        Returns:
+            dict: Giai đoạn -> {'count': số lần, 'seconds': tổng thời gian}.
+        """
+        result = {}
+        with self._lock:
+            for stage, _, seconds in self.spans:
+                entry = result.setdefault(stage, {'count': 0, 'seconds': 0.0})
+                entry['count'] += 1
+                entry['seconds'] += seconds
+        return result
+
+    def by_page(self) -> dict:
+        """
+        Returns:
+            dict: Số trang -> {giai đoạn: tổng thời gian}; khoảng đo không gắn trang bị bỏ qua.
+        """
+        result = {}
+        with self._lock:
+            for stage, page, seconds in self.spans:
+                if page is not None:
+                    stages = result.setdefault(page, {})
+                    stages[stage] = stages.get(stage, 0.0) + seconds
+        return result
+
+# Bảng tổng hợp dùng chung cho toàn tiến trình
+registry = TimingRegistry()
+_local = threading.local()
+
+def begin_rerun() -> RerunTimings:
+    """
+    Bắt đầu ghi các khoảng đo của luồng hiện tại vào một lần chạy lại mới.
+    """
+    _local.rerun = RerunTimings()
+    return _local.rerun
+
+def current_rerun():
+    return getattr(_local, 'rerun', None)
+
+def current_page():
+    return getattr(_local, 'page', None)
+
+@contextmanager
+def page_context(page_num: int):
+    """
+    Gắn số trang cho mọi khoảng đo bên trong khối (trên luồng hiện tại).
+    """
+    previous = current_page()
+    _local.page = page_num
+    try:
+        yield
+    finally:
+        _local.page = previous
+
+def record(stage: str, seconds: float, page=None, rerun=None):
+    registry.observe(stage, seconds)
+    rerun = rerun or current_rerun()
+    if rerun is not None:
+        rerun.add(stage, seconds, page if page is not None else current_page())
+
+def count(event: str, amount: int = 1):
+    """
+    Đếm một sự kiện không có thời gian (xuất thành bộ đếm Prometheus '<prefix>_<event>_total').
+    """
+    registry.increment(event, amount)
+
+def record_spans(spans, rerun=None, page=None):
+    """
+    Ghi lại các khoảng đo thu được ở nơi khác (ví dụ tiến trình con chuyển đổi trang).
+
+    Args:
+        spans (list of tuple): (giai đoạn, số trang, giây) như RerunTimings.spans.
+        rerun (RerunTimings): Lần chạy lại nhận khoảng đo (mặc định là lần hiện tại của luồng).
+        page (int): Số trang gán cho các khoảng đo không có trang.
+    """
+    for stage, span_page, seconds in spans:
+        record(stage, seconds, page=span_page if span_page is not None else page, rerun=rerun)
+
+@contextmanager
+def span(stage: str, page=None):
+    """
+    Đo thời gian của khối lệnh và ghi vào giai đoạn 'stage'.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, page=page)
+
+@contextmanager
+def collect_spans():
+    """
+    Thu các khoảng đo của luồng hiện tại vào một danh sách riêng (dùng trong tiến trình con,
+    để gửi về tiến trình chính cùng kết quả).
+    """
+    previous = current_rerun()
+    collected = begin_rerun()
+    try:
+        yield collected.spans
+    finally:
+        _local.rerun = previous
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.to_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Không ghi nhật ký mỗi lần Prometheus thu thập
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """
+    Mở điểm cuối /metrics cục bộ trên một luồng nền (chỉ một lần cho mỗi tiến trình).
+
+    Returns:
+        ThreadingHTTPServer hoặc None: Máy chủ đang chạy, hoặc None nếu port <= 0.
+    """
+    global _metrics_server
+    if port <= 0:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, name="pdfview-metrics", daemon=True).start()
+        return _metrics_server
@@ -0,0 +1,1289 @@
+import streamlit as st
+import fitz  # PyMuPDF
+import os
+import mmap
+import json
+import tempfile
+import time
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from io import BytesIO
+
+from pdf_engine import (
+    IMAGE_FORMAT,
+    IMAGE_FORMATS,
+    RENDER_SERVICE_URL,
+    TEXT_VIEW_LIMIT,
+    THUMBNAIL_ZOOM,
+    TILE_SIZE,
+    apply_search_highlights,
+    document_pool,
+    file_content_hash,
+    get_cached_render,
+    get_layout_cache,
+    get_render_cache,
+    get_thumbnail_cache,
+    layout_cache,
+    page_tile_grid,
+    pymupdf_extract_layout,
+    pymupdf_parse_page,
+    pymupdf_render_page_as_image,
+    pymupdf_render_tile,
+    render_service_request,
+    single_flight,
+    stitch_tiles,
+    submit_page_render,
+    submit_thumbnail_render,
+    submit_tile_render,
+    text_cache,
+    text_cache_key,
+)
+from search_index import SearchIndex, tokenize
+from text_store import PageTextStore
+import timing
+
+# Chế độ ô bật được từ mức thu phóng này; số hàng ô trong vùng xem
+TILED_ZOOM_THRESHOLD = float(os.environ.get("PDFVIEW_TILED_ZOOM_THRESHOLD", 2.0))
+TILE_VIEW_ROWS = 3
+# Nguồn lưu trữ trang: "book" đọc mọi trang từ một tệp data.pdf, "split" đọc từng tệp page_NNN.pdf
+STORAGE_BACKEND = os.environ.get("PDFVIEW_STORAGE_BACKEND", "book")
+BOOK_FILENAME = "data.pdf"
+# Nguồn mục lục: "auto" dùng mục lục nhúng trong data.pdf nếu có, ngược lại dùng data_detail.txt;
+# "outline" hoặc "detail" để chỉ định cố định
+SECTION_SOURCE = os.environ.get("PDFVIEW_SECTION_SOURCE", "auto")
+# Chỉ mục tìm kiếm toàn văn được lưu trên đĩa và chỉ cập nhật các trang đã thay đổi
+SEARCH_INDEX_PATH = os.environ.get("PDFVIEW_SEARCH_INDEX_PATH", os.path.join(".cache", "search_index.json"))
+# Bảng kê các tệp dữ liệu (kích thước, mtime, mã băm) dùng để phát hiện thay đổi
+MANIFEST_PATH = os.environ.get("PDFVIEW_MANIFEST_PATH", os.path.join(".cache", "manifest.json"))
+# Khoảng thời gian tối thiểu (giây) giữa hai lần quét thay đổi trong một tiến trình
+MANIFEST_CHECK_INTERVAL = float(os.environ.get("PDFVIEW_MANIFEST_CHECK_INTERVAL", 10))
+# Kho văn bản trang trích xuất trước (đọc bằng mmap)
+TEXT_STORE_PATH = os.environ.get("PDFVIEW_TEXT_STORE_PATH", os.path.join(".cache", "page_text.bin"))
+# Nhận dạng ký tự quang học (OCR, qua Tesseract tích hợp trong PyMuPDF) cho trang có quá ít văn bản:
+# ngưỡng mật độ tính bằng số ký tự trên mỗi inch vuông diện tích trang
+OCR_LANGUAGE = os.environ.get("PDFVIEW_OCR_LANGUAGE", "vie+eng")
+OCR_DPI = int(os.environ.get("PDFVIEW_OCR_DPI", 300))
+OCR_MIN_TEXT_DENSITY = float(os.environ.get("PDFVIEW_OCR_MIN_TEXT_DENSITY", 0.5))
+# Số trang mặc định được chuyển đổi mỗi lần ở chế độ phân trang
+PAGE_WINDOW_SIZE = 5
+# Chu kỳ (giây) kiểm tra yêu cầu chạy lại trong lúc chờ các trang đang chuyển đổi
+RENDER_POLL_INTERVAL = 0.2
+# Cổng của điểm cuối /metrics (định dạng Prometheus) trên 127.0.0.1; 0 = tắt
+METRICS_PORT = int(os.environ.get("PDFVIEW_METRICS_PORT", 0))
+# Hiện bảng thời gian xử lý (gỡ lỗi) ở thanh bên theo mặc định
+DEBUG_TIMINGS = os.environ.get("PDFVIEW_DEBUG_TIMINGS", "0") == "1"
+
+def parse_data_detail(file_path: str):
+    """
+    Phân tích tệp data_detail.txt để trích xuất các phần.
+
+    Args:
+        file_path (str): Đường dẫn đến tệp data_detail.txt.
+
+    Returns:
+        list of dict: Mỗi dict chứa 'start', 'end', và 'name' của một phần.
+    """
+    sections = []
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                parts = line.split('#')  # Cập nhật để tách bằng '#'
+                if len(parts) < 3:
+                    st.warning(f"Bỏ qua dòng không hợp lệ trong data_detail.txt: {line}")
+                    continue
+                start_page = int(parts[0])
+                end_page = int(parts[1])
+                name = parts[2].strip()
+                sections.append({
+                    'start': start_page,
+                    'end': end_page,
+                    'name': name
+                })
+    except FileNotFoundError:
+        st.error(f"Không tìm thấy tệp '{file_path}'. Vui lòng đảm bảo nó tồn tại.")
+    except Exception as e:
+        st.error(f"Lỗi đọc tệp '{file_path}': {e}")
+    return sections
+
+def get_page_numbers(section):
+    """
+    Tạo danh sách số trang trong một phần.
+
+    Args:
+        section (dict): Một dict chứa 'start' và 'end' của phần.
+
+    Returns:
+        list of int: Danh sách số trang.
+    """
+    return list(range(section['start'], section['end'] + 1))
+
+def get_all_page_numbers(sections):
+    """
+    Gom các số trang (không trùng lặp) của mọi phần.
+
+    Args:
+        sections (list of dict): Các phần lấy từ parse_data_detail.
+
+    Returns:
+        list of int: Danh sách số trang đã sắp xếp.
+    """
+    pages = set()
+    for section in sections:
+        pages.update(get_page_numbers(section))
+    return sorted(pages)
+
+class SectionTree:
+    """
+    Cây các phần dựng từ khoảng trang: phần cha là phần hẹp nhất chứa trọn khoảng trang của phần con.
+
+    Mỗi phần được định danh bằng 'id' (vị trí trong danh sách đầu vào), không bằng tên, vì tên có thể
+    trùng nhau (ví dụ "Bài tập" trong mọi chương, hoặc phần con trùng tên phần cha).
+    Tra cứu theo định danh và theo số trang đều là O(1) nhờ các bảng băm được tính sẵn một lần.
+    """
+
+    def __init__(self, sections):
+        self.sections = [dict(section, id=i) for i, section in enumerate(sections)]
+        self.parent = {}
+        self.children = {section['id']: [] for section in self.sections}
+        self.roots = []
+        self._page_path = {}
+
+        # Sắp theo trang bắt đầu tăng dần, trang kết thúc giảm dần: phần cha luôn đứng trước phần con
+        # (khoảng trang trùng nhau thì giữ thứ tự đầu vào)
+        stack = []
+        for section in sorted(self.sections, key=lambda s: (s['start'], -s['end'])):
+            while stack and not (stack[-1]['start'] <= section['start'] and section['end'] <= stack[-1]['end']):
+                stack.pop()
+            if stack:
+                self.parent[section['id']] = stack[-1]['id']
+                self.children[stack[-1]['id']].append(section)
+            else:
+                self.roots.append(section)
+            # Chồng chứa đúng chuỗi phần từ gốc tới phần hiện tại
+            stack.append(section)
+            # Phần sau (nằm sâu hơn) ghi đè nên mỗi trang trỏ tới chuỗi phần từ gốc tới phần hẹp nhất
+            path = list(stack)
+            for page_num in range(section['start'], section['end'] + 1):
+                self._page_path[page_num] = path
+
+    def get(self, section_id: int):
+        if section_id is None or not 0 <= section_id < len(self.sections):
+            return None
+        return self.sections[section_id]
+
+    def children_of(self, section_id: int):
+        return self.children.get(section_id, [])
+
+    def parent_of(self, section_id: int):
+        return self.get(self.parent.get(section_id))
+
+    def path_for_page(self, page_num: int):
+        """
+        Trả về chuỗi phần chứa trang, từ phần gốc tới phần hẹp nhất (rỗng nếu không có).
+        """
+        return self._page_path.get(page_num, [])
+
+    def section_for_page(self, page_num: int):
+        path = self.path_for_page(page_num)
+        return path[-1] if path else None
+
+def parse_pdf_outline(pdf_path: str):
+    """
+    Đọc mục lục nhúng (outline) của tệp PDF thành danh sách phần cùng dạng với parse_data_detail.
+
+    Mỗi mục kéo dài tới trước mục kế tiếp cùng cấp hoặc cấp cao hơn, hoặc tới trang cuối.
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+
+    Returns:
+        list of dict: Mỗi dict chứa 'start', 'end', và 'name' (rỗng nếu PDF không có mục lục).
+    """
+    with document_pool.checkout(pdf_path) as doc:
+        toc = doc.get_toc(simple=True)
+        page_count = doc.page_count
+    entries = [(level, title.strip(), page) for level, title, page in toc if page >= 1 and title.strip()]
+    sections = []
+    for i, (level, title, start_page) in enumerate(entries):
+        end_page = page_count
+        for next_level, _, next_page in entries[i + 1:]:
+            if next_level <= level:
+                end_page = max(start_page, next_page - 1)
+                break
+        sections.append({'start': start_page, 'end': end_page, 'name': title})
+    return sections
+
+_section_tree_memo = {}
+_section_tree_lock = threading.Lock()
+
+def load_section_tree(file_path: str, pdf_path: str = None, source: str = SECTION_SOURCE):
+    """
+    Dựng SectionTree từ mục lục nhúng của PDF hoặc từ data_detail.txt; kết quả được giữ lại
+    cho tới khi mtime của tệp nguồn thay đổi.
+
+    Args:
+        file_path (str): Đường dẫn đến tệp data_detail.txt.
+        pdf_path (str): Tệp PDF toàn bộ sách (để đọc mục lục nhúng), có thể None.
+        source (str): "auto", "outline" hoặc "detail".
+
+    Returns:
+        SectionTree: Cây các phần (rỗng nếu không đọc được nguồn nào).
+    """
+    use_outline = source in ("auto", "outline") and pdf_path is not None and os.path.isfile(pdf_path)
+    try:
+        memo_key = (
+            os.path.abspath(file_path), os.stat(file_path).st_mtime_ns,
+            os.path.abspath(pdf_path) if use_outline else None,
+            os.stat(pdf_path).st_mtime_ns if use_outline else None,
+        )
+    except OSError:
+        memo_key = None
+    with _section_tree_lock:
+        if memo_key is not None and memo_key in _section_tree_memo:
+            return _section_tree_memo[memo_key]
+    sections = []
+    if use_outline:
+        try:
+            sections = parse_pdf_outline(pdf_path)
+        except Exception as e:
+            st.warning(f"Không đọc được mục lục của '{pdf_path}': {e}")
+    if not sections and source != "outline":
+        sections = parse_data_detail(file_path)
+    tree = SectionTree(sections)
+    if memo_key is not None and tree.sections:
+        with _section_tree_lock:
+            _section_tree_memo.clear()  # Chỉ giữ phiên bản mới nhất
+            _section_tree_memo[memo_key] = tree
+    return tree
+
+def find_section_for_page(tree: SectionTree, page_num: int):
+    """
+    Tìm phần chính và phần con chứa một trang.
+
+    Args:
+        tree (SectionTree): Cây các phần.
+        page_num (int): Số trang (bắt đầu từ 1).
+
+    Returns:
+        tuple: (định danh phần chính, định danh phần con hoặc None), hoặc (None, None) nếu không tìm thấy.
+    """
+    path = tree.path_for_page(page_num)
+    if not path:
+        return None, None
+    main_section = path[0]
+    if not tree.children_of(main_section['id']):
+        return main_section['id'], None
+    # Danh sách phần con gồm chính phần chính và các phần con trực tiếp của nó
+    return main_section['id'], (path[1] if len(path) > 1 else main_section)['id']
+
+def resolve_storage_backend(data_dir: str, backend: str = STORAGE_BACKEND) -> str:
+    """
+    Chọn nguồn lưu trữ trang thực tế; quay về các tệp từng trang nếu thiếu data.pdf.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        backend (str): Nguồn được cấu hình ("book" hoặc "split").
+
+    Returns:
+        str: "book" hoặc "split".
+    """
+    if backend == "book" and not os.path.isfile(os.path.join(data_dir, BOOK_FILENAME)):
+        return "split"
+    return backend
+
+def resolve_page_source(data_dir: str, page_num: int, backend: str):
+    """
+    Ánh xạ số trang trong data_detail.txt sang tệp PDF và chỉ số trang trong tệp đó.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        page_num (int): Số trang (bắt đầu từ 1).
+        backend (str): "book" hoặc "split".
+
+    Returns:
+        tuple: (đường dẫn tệp PDF, chỉ số trang bắt đầu từ 0).
+    """
+    if backend == "book":
+        return os.path.join(data_dir, BOOK_FILENAME), page_num - 1
+    return os.path.join(data_dir, f"page_{page_num:03}.pdf"), 0
+
+def pymupdf_extract_page_pdf(pdf_path: str, page_number: int = 0) -> bytes:
+    """
+    Tách một trang của tệp PDF thành một tệp PDF một trang.
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_number (int): Số trang cần tách (chỉ số bắt đầu từ 0).
+
+    Returns:
+        bytes: Nội dung tệp PDF chỉ gồm trang được chỉ định.
+    """
+    with document_pool.checkout(pdf_path) as doc:
+        if page_number < 0 or page_number >= doc.page_count:
+            raise ValueError(f"Số trang {page_number + 1} vượt quá phạm vi cho tệp '{pdf_path}'.")
+        with fitz.open() as single:
+            single.insert_pdf(doc, from_page=page_number, to_page=page_number)
+            return single.tobytes(garbage=3, deflate=True)
+
+def read_file_bytes(path: str) -> bytes:
+    """
+    Đọc toàn bộ tệp qua ánh xạ bộ nhớ (mmap), tránh bộ đệm đọc trung gian.
+
+    Args:
+        path (str): Đường dẫn đến tệp.
+
+    Returns:
+        bytes: Nội dung tệp.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:]
+
+def page_source_hash(pdf_path: str, page_index: int) -> str:
+    """
+    Định danh phiên bản nguồn của một trang: "<mã băm tệp PDF>:<chỉ số trang>".
+    """
+    return f"{file_content_hash(pdf_path)}:{page_index}"
+
+_text_store = None
+_text_store_mtime = None
+_text_store_lock = threading.Lock()
+
+def get_page_text_store() -> PageTextStore:
+    """
+    Trả về kho văn bản trang dùng chung; mở lại khi kho được ghi mới trên đĩa.
+    """
+    global _text_store, _text_store_mtime
+    try:
+        mtime = os.stat(TEXT_STORE_PATH + ".json").st_mtime_ns
+    except OSError:
+        mtime = None
+    with _text_store_lock:
+        if _text_store is None or mtime != _text_store_mtime:
+            if _text_store is not None:
+                _text_store.close()
+            _text_store = PageTextStore(TEXT_STORE_PATH)
+            _text_store_mtime = mtime
+        return _text_store
+
+def get_page_text(pdf_path: str, page_index: int, page_num: int, limit: int = TEXT_VIEW_LIMIT) -> str:
+    """
+    Lấy văn bản của một trang: đọc từ kho văn bản nếu có bản khớp với nguồn hiện tại,
+    ngược lại trích xuất qua dịch vụ chuyển đổi (nếu được cấu hình) hoặc trực tiếp từ PDF.
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_index (int): Chỉ số trang trong tệp (bắt đầu từ 0).
+        page_num (int): Số trang (bắt đầu từ 1).
+        limit (int): Số ký tự tối đa trả về (None = toàn bộ).
+
+    Returns:
+        str: Văn bản của trang.
+    """
+    store = get_page_text_store()
+    if page_num in store:
+        try:
+            if store.source_hash(page_num) == page_source_hash(pdf_path, page_index):
+                return store.get(page_num, limit)
+        except OSError:
+            pass
+    if RENDER_SERVICE_URL:
+        cache_key = text_cache_key(pdf_path, page_index)
+        cached = text_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            return cached[:limit]
+        try:
+            with timing.span("render_service"):
+                data = render_service_request("text", path=os.path.abspath(pdf_path), page=page_index)
+            text = data.decode('utf-8')
+            if cache_key is not None:
+                text_cache.put(cache_key, text)
+            return text[:limit]
+        except OSError:
+            pass  # Dịch vụ không khả dụng: trích xuất ngay trong tiến trình
+    try:
+        return pymupdf_parse_page(pdf_path, page_number=page_index, limit=limit)
+    except Exception as e:
+        st.error(f"Lỗi trích xuất văn bản trang PDF '{pdf_path}': {e}")
+        return ""
+
+def build_page_text_store(data_dir: str, page_numbers, backend: str) -> int:
+    """
+    Trích xuất văn bản của mọi trang vào kho văn bản; trang có nguồn không đổi được giữ nguyên.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        page_numbers (list of int): Các số trang cần có trong kho.
+        backend (str): Nguồn lưu trữ trang ("book" hoặc "split").
+
+    Returns:
+        int: Số trang đã trích xuất lại.
+    """
+    store = get_page_text_store()
+    pages = {}
+    extracted = 0
+    for page_num in page_numbers:
+        pdf_path, page_index = resolve_page_source(data_dir, page_num, backend)
+        try:
+            source_hash = page_source_hash(pdf_path, page_index)
+        except OSError:
+            continue
+        if store.source_hash(page_num) == source_hash:
+            pages[page_num] = (store.get(page_num), source_hash, store.method(page_num))
+        else:
+            try:
+                pages[page_num] = (pymupdf_parse_page(pdf_path, page_number=page_index, limit=None), source_hash)
+            except Exception:
+                continue  # Trang lỗi không được đưa vào kho, sẽ được thử lại lần sau
+            extracted += 1
+    if extracted or len(pages) != len(store):
+        PageTextStore.write(TEXT_STORE_PATH, pages)
+    return extracted
+
+def text_density(text: str, page_rect) -> float:
+    """
+    Tính mật độ văn bản của trang (số ký tự không trắng trên mỗi inch vuông).
+    """
+    area_sq_in = (page_rect.width / 72) * (page_rect.height / 72)
+    return len("".join(text.split())) / area_sq_in if area_sq_in else 0.0
+
+def pymupdf_ocr_page(pdf_path: str, page_number: int = 0, language: str = OCR_LANGUAGE, dpi: int = OCR_DPI) -> str:
+    """
+    Nhận dạng văn bản của một trang bằng OCR (cần Tesseract và dữ liệu ngôn ngữ được cài trên máy).
+
+    Args:
+        pdf_path (str): Đường dẫn đến tệp PDF.
+        page_number (int): Số trang (chỉ số bắt đầu từ 0).
+        language (str): Mã ngôn ngữ Tesseract, ví dụ "vie+eng".
+        dpi (int): Độ phân giải khi quét trang.
+
+    Returns:
+        str: Văn bản nhận dạng được.
+    """
+    with document_pool.checkout(pdf_path) as doc:
+        page = doc.load_page(page_number)
+        textpage = page.get_textpage_ocr(language=language, dpi=dpi, full=True)
+        return page.get_text(textpage=textpage)
+
+def find_low_text_pages(data_dir: str, page_numbers, backend: str):
+    """
+    Tìm các trang có mật độ văn bản thấp hơn OCR_MIN_TEXT_DENSITY và chưa được OCR cho phiên bản nguồn hiện tại.
+
+    Returns:
+        list of tuple: (số trang, đường dẫn PDF, chỉ số trang, mã băm nguồn).
+    """
+    store = get_page_text_store()
+    candidates = []
+    for page_num in page_numbers:
+        pdf_path, page_index = resolve_page_source(data_dir, page_num, backend)
+        try:
+            source_hash = page_source_hash(pdf_path, page_index)
+        except OSError:
+            continue
+        if store.source_hash(page_num) == source_hash and store.method(page_num) == "ocr":
+            continue  # Đã OCR và trang không đổi
+        text = get_page_text(pdf_path, page_index, page_num, limit=None)
+        with document_pool.checkout(pdf_path) as doc:
+            if page_index >= doc.page_count:
+                continue
+            page_rect = doc.load_page(page_index).rect
+        if text_density(text, page_rect) < OCR_MIN_TEXT_DENSITY:
+            candidates.append((page_num, pdf_path, page_index, source_hash))
+    return candidates
+
+def run_ocr_pipeline(data_dir: str, page_numbers, backend: str, workers: int = None):
+    """
+    OCR song song (bể tiến trình) các trang có ít văn bản và lưu kết quả vào kho văn bản trang.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        page_numbers (list of int): Các số trang cần xét.
+        backend (str): Nguồn lưu trữ trang ("book" hoặc "split").
+        workers (int): Số tiến trình OCR (mặc định bằng số lõi CPU).
+
+    Returns:
+        tuple: (danh sách trang đã OCR, dict trang -> thông báo lỗi).
+    """
+    build_page_text_store(data_dir, page_numbers, backend)
+    candidates = find_low_text_pages(data_dir, page_numbers, backend)
+    if not candidates:
+        return [], {}
+    done, errors = [], {}
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(pymupdf_ocr_page, pdf_path, page_index): (page_num, source_hash)
+                   for page_num, pdf_path, page_index, source_hash in candidates}
+        for future in as_completed(futures):
+            page_num, source_hash = futures[future]
+            try:
+                results[page_num] = (future.result(), source_hash, "ocr")
+                done.append(page_num)
+            except Exception as e:
+                errors[page_num] = str(e)
+    if results:
+        pages = get_page_text_store().entries()
+        pages.update(results)
+        PageTextStore.write(TEXT_STORE_PATH, pages)
+    return sorted(done), errors
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+def get_search_index(data_dir: str, page_numbers, backend: str) -> SearchIndex:
+    """
+    Trả về chỉ mục tìm kiếm dùng chung, đã được cập nhật cho các trang có mã băm thay đổi.
+
+    Chỉ mục được nạp từ đĩa lần đầu, chỉ trích xuất lại văn bản của các trang mới/đã đổi,
+    và chỉ ghi lại xuống đĩa khi có thay đổi.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        page_numbers (list of int): Các số trang cần có trong chỉ mục.
+        backend (str): Nguồn lưu trữ trang ("book" hoặc "split").
+
+    Returns:
+        SearchIndex: Chỉ mục tìm kiếm.
+    """
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex.load(SEARCH_INDEX_PATH)
+        changed = False
+        for page_num in page_numbers:
+            pdf_path, page_index = resolve_page_source(data_dir, page_num, backend)
+            try:
+                page_hash = page_source_hash(pdf_path, page_index)
+            except OSError:
+                continue
+            store = get_page_text_store()
+            if store.source_hash(page_num) == page_hash and store.method(page_num) == "ocr":
+                page_hash += ":ocr"  # Lập chỉ mục lại khi trang vừa được bổ sung văn bản OCR
+            if not _search_index.is_current(page_num, page_hash):
+                _search_index.add_page(page_num, get_page_text(pdf_path, page_index, page_num, limit=None), page_hash)
+                changed = True
+        if changed:
+            try:
+                _search_index.save(SEARCH_INDEX_PATH)
+            except OSError:
+                pass  # Không lưu được thì vẫn dùng chỉ mục trong bộ nhớ
+        return _search_index
+
+def scan_manifest(paths, previous=None) -> dict:
+    """
+    Lập bảng kê các tệp; chỉ băm lại những tệp có kích thước hoặc mtime khác bảng kê trước.
+
+    Args:
+        paths (list of str): Các tệp cần kê.
+        previous (dict): Bảng kê trước đó (có thể None).
+
+    Returns:
+        dict: Đường dẫn -> {'size', 'mtime_ns', 'sha256'}.
+    """
+    previous = previous or {}
+    manifest = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        old = previous.get(path)
+        if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+            manifest[path] = old
+        else:
+            manifest[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_content_hash(path)}
+    return manifest
+
+def diff_manifest(old: dict, new: dict) -> dict:
+    """
+    So sánh hai bảng kê.
+
+    Returns:
+        dict: Đường dẫn đã thêm/sửa/xóa -> (mã băm cũ hoặc None, mã băm mới hoặc None).
+    """
+    changes = {}
+    for path in set(old) | set(new):
+        old_hash = old[path]['sha256'] if path in old else None
+        new_hash = new[path]['sha256'] if path in new else None
+        if old_hash != new_hash:
+            changes[path] = (old_hash, new_hash)
+    return changes
+
+def invalidate_derived_data(changes: dict):
+    """
+    Xóa hình ảnh, văn bản và mục chỉ mục tìm kiếm được tạo từ các tệp đã thay đổi.
+
+    Args:
+        changes (dict): Kết quả của diff_manifest.
+    """
+    global _search_index
+    for path, (old_hash, _) in changes.items():
+        abs_path = os.path.abspath(path)
+        text_cache.invalidate(lambda key: key[0] == abs_path)
+        if old_hash is None:
+            continue
+        get_render_cache().invalidate_file(old_hash)
+        get_thumbnail_cache().invalidate_file(old_hash)
+        get_layout_cache().invalidate_file(old_hash)
+        layout_cache.invalidate(lambda key: key[0] == old_hash)
+        with _search_index_lock:
+            if _search_index is None:
+                _search_index = SearchIndex.load(SEARCH_INDEX_PATH)
+            if _search_index.remove_source(old_hash):
+                try:
+                    _search_index.save(SEARCH_INDEX_PATH)
+                except OSError:
+                    pass
+
+_manifest_lock = threading.Lock()
+_manifest_checked_at = 0.0
+
+def refresh_data_manifest(data_dir: str, extra_files=(), force: bool = False) -> dict:
+    """
+    Quét thay đổi trong thư mục dữ liệu (tối đa một lần mỗi MANIFEST_CHECK_INTERVAL giây)
+    và chỉ vô hiệu hóa dữ liệu dẫn xuất của những tệp đã thay đổi.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        extra_files (tuple of str): Các tệp khác cần theo dõi (ví dụ data_detail.txt).
+        force (bool): Quét ngay, bỏ qua khoảng thời gian tối thiểu.
+
+    Returns:
+        dict: Các thay đổi đã phát hiện (xem diff_manifest); rỗng nếu không quét hoặc không đổi.
+    """
+    global _manifest_checked_at
+    with _manifest_lock:
+        now = time.monotonic()
+        if not force and now - _manifest_checked_at < MANIFEST_CHECK_INTERVAL:
+            return {}
+        _manifest_checked_at = now
+        try:
+            with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (FileNotFoundError, ValueError):
+            previous = {}
+        paths = [os.path.join(data_dir, name) for name in sorted(os.listdir(data_dir))
+                 if os.path.isfile(os.path.join(data_dir, name))]
+        manifest = scan_manifest(paths + list(extra_files), previous)
+        changes = diff_manifest(previous, manifest) if previous else {}
+        if changes:
+            invalidate_derived_data(changes)
+        if changes or not previous:
+            os.makedirs(os.path.dirname(MANIFEST_PATH) or ".", exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(MANIFEST_PATH) or ".", prefix='.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, MANIFEST_PATH)
+        return changes
+
+def go_to_page(tree: SectionTree, page_num: int):
+    """
+    Chọn phần chứa trang và dời cửa sổ hiển thị tới trang đó (dùng làm on_click của nút).
+    """
+    main_id, sub_id = find_section_for_page(tree, page_num)
+    if main_id is None:
+        return
+    st.session_state.main_section = main_id
+    if sub_id is not None:
+        st.session_state.sub_section = sub_id
+    section = tree.get(sub_id if sub_id is not None else main_id)
+    st.session_state.section_key = section['id']
+    st.session_state.window_start = page_num - section['start']
+    st.session_state.download_pages = set()
+
+def render_search(data_dir: str, tree: SectionTree, backend: str):
+    """
+    Hiển thị ô tìm kiếm toàn văn và danh sách trang khớp ở thanh bên.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        tree (SectionTree): Cây các phần.
+        backend (str): Nguồn lưu trữ trang ("book" hoặc "split").
+
+    Returns:
+        str: Chuỗi tìm kiếm hiện tại.
+    """
+    query = st.sidebar.text_input("🔍 Tìm Kiếm", placeholder="Ví dụ: Điện Biên Phủ")
+    if not query.strip():
+        return query
+    with st.spinner("Đang lập chỉ mục tìm kiếm..."):
+        index = get_search_index(data_dir, get_all_page_numbers(tree.sections), backend)
+    hits = index.search(query)
+    with st.sidebar.expander(f"Kết quả tìm kiếm ({len(hits)})", expanded=True):
+        if not hits:
+            st.info("Không tìm thấy trang phù hợp.")
+        for hit in hits:
+            st.button(f"Trang {hit['page']}", key=f"search_hit_{hit['page']}",
+                      on_click=go_to_page, args=(tree, hit['page']))
+            st.markdown(hit['snippet'])
+    return query
+
+def initialize_session_state(total_pages=0, section_key=None):
+    """
+    Khởi tạo các biến trạng thái phiên cho việc điều hướng trang.
+
+    Args:
+        total_pages (int): Tổng số trang trong phần đã chọn.
+        section_key: Định danh phần đang xem; khi đổi phần, cửa sổ trang quay về đầu.
+    """
+    if st.session_state.get('section_key') != section_key:
+        st.session_state.section_key = section_key
+        st.session_state.window_start = 0
+        st.session_state.download_pages = set()
+    st.session_state.total_pages = total_pages
+    if 'window_start' not in st.session_state:
+        st.session_state.window_start = 0
+    if 'download_pages' not in st.session_state:
+        st.session_state.download_pages = set()
+
+def get_page_window(page_numbers, window_start: int, window_size: int):
+    """
+    Lấy các trang nằm trong cửa sổ hiển thị hiện tại.
+
+    Args:
+        page_numbers (list of int): Toàn bộ số trang của phần.
+        window_start (int): Vị trí bắt đầu của cửa sổ (chỉ số trong page_numbers).
+        window_size (int): Số trang trong một cửa sổ.
+
+    Returns:
+        list of int: Các số trang thuộc cửa sổ.
+    """
+    window_start = max(0, min(window_start, max(len(page_numbers) - 1, 0)))
+    return page_numbers[window_start:window_start + window_size]
+
+def render_page_navigation(total_pages: int, window_size: int, key: str):
+    """
+    Hiển thị các nút điều hướng giữa các cửa sổ trang.
+
+    Args:
+        total_pages (int): Tổng số trang trong phần đã chọn.
+        window_size (int): Số trang trong một cửa sổ.
+        key (str): Tiền tố khóa widget (thanh điều hướng xuất hiện ở đầu và cuối trang).
+    """
+    start = st.session_state.window_start
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    with prev_col:
+        if st.button("⬅️ Trước", key=f"{key}_prev", disabled=start <= 0):
+            st.session_state.window_start = max(0, start - window_size)
+            st.rerun()
+    with info_col:
+        end = min(start + window_size, total_pages)
+        st.markdown(f"Trang {start + 1}–{end} / {total_pages}")
+    with next_col:
+        if st.button("Sau ➡️", key=f"{key}_next", disabled=start + window_size >= total_pages):
+            st.session_state.window_start = start + window_size
+            st.rerun()
+
+class RenderBatch:
+    """
+    Các yêu cầu chuyển đổi được gửi trong một lần chạy script.
+
+    Khi người xem đổi phần hoặc mức thu phóng giữa chừng, Streamlit dừng script bằng một ngoại lệ
+    tại lần gọi st.* tiếp theo; lúc đó (khi thoát khối with) các yêu cầu chưa xong được hủy ngay
+    để giải phóng bể tiến trình cho khung nhìn mới. Yêu cầu mà phiên khác đang chờ chung thì được giữ.
+    Trang đã bắt đầu chuyển đổi trong tiến trình con vẫn chạy hết và được lưu vào bộ nhớ đệm.
+    """
+
+    def __init__(self):
+        self.futures = []
+        self.cancelled = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cancel_pending()
+        return False
+
+    def add(self, future: Future) -> Future:
+        self.futures.append(future)
+        return future
+
+    def as_completed(self, futures, poll: float = RENDER_POLL_INTERVAL):
+        """
+        Trả về lần lượt các Future khi chúng xong. Trong lúc chờ, trạng thái phiên được đọc định kỳ:
+        đó là điểm Streamlit kiểm tra yêu cầu chạy lại, nên script dừng ngay cả khi chưa trang nào xong.
+        """
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+            if not done:
+                st.session_state.get("window_start")
+            yield from done
+
+    def cancel_pending(self) -> int:
+        """
+        Hủy các yêu cầu chưa xong của lần chạy này.
+
+        Returns:
+            int: Số yêu cầu đã hủy.
+        """
+        for future in self.futures:
+            if not future.done() and single_flight.release(future):
+                self.cancelled += 1
+                timing.count("render_cancelled")
+        self.futures = []
+        return self.cancelled
+
+def show_page_image(placeholder, page_num: int, img_bytes: bytes):
+    """
+    Điền hình ảnh trang vào ô giữ chỗ của nó.
+
+    Args:
+        placeholder: Ô giữ chỗ (st.empty) của trang.
+        page_num (int): Số trang (bắt đầu từ 1).
+        img_bytes (bytes): Dữ liệu hình ảnh; rỗng nếu chuyển đổi thất bại.
+    """
+    if img_bytes:
+        with timing.span("st_serialize", page=page_num):
+            placeholder.image(img_bytes, caption=f"Trang {page_num}", use_column_width=True)
+    else:
+        placeholder.error("Không thể hiển thị hình ảnh trang.")
+
+def render_pages_progressively(data_dir: str, page_numbers, zoom_factor: float, backend: str, fmt: str = IMAGE_FORMAT, highlight_terms=()):
+    """
+    Hiển thị các trang theo kiểu truyền dần: ô giữ chỗ của mọi trang được gửi đi ngay,
+    rồi mỗi ô được điền khi trang đó chuyển đổi xong, nên một trang chậm không chặn các trang sau.
+    Trang chưa có bản đầy đủ sẽ hiện ảnh thu nhỏ trước, rồi được thay khi bản đầy đủ sẵn sàng.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        page_numbers (list of int): Các số trang cần hiển thị.
+        zoom_factor (float): Mức thu phóng.
+        backend (str): Nguồn lưu trữ trang ("book" hoặc "split").
+        fmt (str): Định dạng hình ảnh.
+        highlight_terms (tuple of str): Từ khóa tìm kiếm (đã gấp dấu) cần tô sáng trên trang.
+    """
+    def highlighted(img_bytes, page_num, scale):
+        pdf_path, page_index = sources[page_num]
+        try:
+            return apply_search_highlights(img_bytes, pdf_path, page_index, scale, highlight_terms, fmt)
+        except Exception:
+            return img_bytes  # Lỗi tô sáng không được làm mất hình ảnh trang
+
+    placeholders = {}
+    sources = {}
+    for page_num in page_numbers:
+        placeholders[page_num] = st.empty()
+        st.markdown("---")  # Ngăn cách các trang
+        pdf_path, page_index = resolve_page_source(data_dir, page_num, backend)
+        if backend == "split" and not os.path.isfile(pdf_path):
+            placeholders[page_num].error(f"Không tìm thấy tệp PDF '{os.path.basename(pdf_path)}' trong '{data_dir}'.")
+            continue
+        placeholders[page_num].info(f"⏳ Đang chuyển đổi trang {page_num}...")
+        sources[page_num] = (pdf_path, page_index)
+
+    # Các trang đã có trong bộ nhớ đệm được điền trước tiên
+    pending_pages = []
+    for page_num, (pdf_path, page_index) in sources.items():
+        cached = get_cached_render(pdf_path, page_index, zoom_factor, fmt)
+        if cached is not None:
+            show_page_image(placeholders[page_num], page_num, highlighted(cached, page_num, zoom_factor))
+        else:
+            pending_pages.append(page_num)
+
+    with RenderBatch() as batch:
+        # Ảnh thu nhỏ rẻ nên được gửi trước và hiện ngay khi xong, nhất là khi kéo thanh thu phóng
+        # hoặc đổi phần; mọi yêu cầu được gửi đi trước khi chờ, để các tiến trình con không phải rảnh
+        thumbnails = {}
+        for page_num in pending_pages:
+            pdf_path, page_index = sources[page_num]
+            with timing.page_context(page_num):
+                future = batch.add(submit_thumbnail_render(pdf_path, page_index, fmt))
+            if future.done():
+                # Có sẵn trong bộ nhớ đệm, hoặc không có bể tiến trình (vừa chuyển đổi trực tiếp)
+                _show_thumbnail(placeholders[page_num], page_num, future, highlighted)
+            else:
+                thumbnails[future] = page_num
+
+        fulls = {}
+        for page_num in pending_pages:
+            pdf_path, page_index = sources[page_num]
+            with timing.page_context(page_num):
+                future = batch.add(submit_page_render(pdf_path, page_index, zoom_factor, fmt))
+            if future.done():
+                _fill_from_future(placeholders[page_num], page_num, future, sources[page_num], zoom_factor, fmt, highlighted)
+            else:
+                fulls[future] = page_num
+
+        shown = set(pending_pages) - set(fulls.values())
+        for future in batch.as_completed([*thumbnails, *fulls] if fulls else []):
+            if future in fulls:
+                page_num = fulls.pop(future)
+                _fill_from_future(placeholders[page_num], page_num, future, sources[page_num], zoom_factor, fmt, highlighted)
+                shown.add(page_num)
+                if not fulls:
+                    break  # Ảnh thu nhỏ còn lại không cần nữa (được hủy khi thoát khối)
+            elif thumbnails[future] not in shown:
+                _show_thumbnail(placeholders[thumbnails[future]], thumbnails[future], future, highlighted)
+
+def _show_thumbnail(placeholder, page_num: int, future: Future, highlighted):
+    with timing.page_context(page_num):
+        try:
+            thumbnail = highlighted(future.result(), page_num, THUMBNAIL_ZOOM)
+        except Exception:
+            return  # Ảnh thu nhỏ chỉ để xem trước: bỏ qua nếu lỗi
+        if thumbnail:
+            with timing.span("st_serialize"):
+                placeholder.image(thumbnail, caption=f"Trang {page_num} (đang tải bản đầy đủ...)", use_column_width=True)
+
+def _fill_from_future(placeholder, page_num: int, future: Future, source, zoom_factor: float, fmt: str, highlighted):
+    pdf_path, page_index = source
+    with timing.page_context(page_num):
+        _show_future_result(placeholder, page_num, future, pdf_path, page_index, zoom_factor, fmt, highlighted)
+
+def _show_future_result(placeholder, page_num: int, future: Future, pdf_path: str, page_index: int, zoom_factor: float, fmt: str, highlighted):
+    try:
+        try:
+            img_bytes = future.result()
+        except Exception:
+            # Tiến trình con gặp sự cố: chuyển đổi lại ngay trên luồng hiện tại
+            img_bytes = pymupdf_render_page_as_image(pdf_path, page_number=page_index, zoom=zoom_factor, fmt=fmt)
+        show_page_image(placeholder, page_num, highlighted(img_bytes, page_num, zoom_factor))
+    except Exception as e:
+        placeholder.error(f"Lỗi hiển thị trang PDF: {e}")
+
+def render_tiled_pages(data_dir: str, page_numbers, zoom_factor: float, backend: str, fmt: str = IMAGE_FORMAT):
+    """
+    Hiển thị các trang ở chế độ ô: với mỗi trang, người xem chọn vùng xem (các hàng ô) và chỉ các ô
+    trong vùng đó được chuyển đổi hoặc lấy từ bộ nhớ đệm. Các ô của mọi trang đang xem được gửi
+    cùng một lượt, và mỗi trang được ghép và hiển thị ngay khi đủ ô của nó.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        page_numbers (list of int): Các số trang cần hiển thị.
+        zoom_factor (float): Mức thu phóng.
+        backend (str): Nguồn lưu trữ trang ("book" hoặc "split").
+        fmt (str): Định dạng hình ảnh.
+    """
+    views = {}
+    for page_num in page_numbers:
+        with timing.page_context(page_num):
+            view = _tiled_page_view(data_dir, page_num, zoom_factor, backend)
+        st.markdown("---")  # Ngăn cách các trang
+        if view is not None:
+            views[page_num] = view
+
+    with RenderBatch() as batch:
+        pending = {}
+        remaining = {}
+        for page_num, view in views.items():
+            remaining[page_num] = len(view['tiles'])
+            with timing.page_context(page_num):
+                for col, row in view['tiles']:
+                    future = batch.add(submit_tile_render(view['pdf_path'], view['page_index'], zoom_factor, col, row, fmt))
+                    pending[future] = (page_num, col, row)
+
+        for future in batch.as_completed(pending):
+            page_num, col, row = pending[future]
+            view = views[page_num]
+            with timing.page_context(page_num):
+                try:
+                    tile = future.result()
+                except Exception:
+                    # Tiến trình con gặp sự cố: chuyển đổi lại ô ngay trên luồng hiện tại
+                    try:
+                        tile = pymupdf_render_tile(view['pdf_path'], view['page_index'], zoom_factor, col, row, fmt)
+                    except Exception as e:
+                        st.error(f"Lỗi chuyển đổi ô ({col}, {row}) của trang PDF '{view['pdf_path']}': {e}")
+                        tile = b""
+                view['images'][(col, row - view['first_row'])] = tile
+                remaining[page_num] -= 1
+                if remaining[page_num] == 0:
+                    _show_tiled_page(page_num, view, fmt)
+
+def _tiled_page_view(data_dir: str, page_num: int, zoom_factor: float, backend: str):
+    """
+    Hiển thị thanh chọn vùng xem và ô giữ chỗ của một trang ở chế độ ô.
+
+    Returns:
+        dict hoặc None: Nguồn trang, ô giữ chỗ và danh sách ô (cột, hàng) cần tải; None nếu trang lỗi.
+    """
+    pdf_path, page_index = resolve_page_source(data_dir, page_num, backend)
+    if backend == "split" and not os.path.isfile(pdf_path):
+        st.error(f"Không tìm thấy tệp PDF '{os.path.basename(pdf_path)}' trong '{data_dir}'.")
+        return None
+    try:
+        cols, rows, width, height = page_tile_grid(pdf_path, page_index, zoom_factor)
+    except Exception as e:
+        st.error(f"Lỗi hiển thị trang PDF: {e}")
+        return None
+    first_row = 0
+    if rows > TILE_VIEW_ROWS:
+        first_row = st.slider(f"Vùng xem trang {page_num}", 0, rows - TILE_VIEW_ROWS, 0, key=f"tile_view_{page_num}")
+    view_rows = range(first_row, min(rows, first_row + TILE_VIEW_ROWS))
+    view_height = min(height, view_rows.stop * TILE_SIZE) - first_row * TILE_SIZE
+    placeholder = st.empty()
+    placeholder.info(f"⏳ Đang chuyển đổi trang {page_num}...")
+    return {
+        'pdf_path': pdf_path,
+        'page_index': page_index,
+        'placeholder': placeholder,
+        'cols': cols,
+        'rows': rows,
+        'first_row': first_row,
+        'view_rows': view_rows,
+        'size': (width, view_height),
+        'tiles': [(col, row) for row in view_rows for col in range(cols)],
+        'images': {},
+    }
+
+def _show_tiled_page(page_num: int, view: dict, fmt: str):
+    placeholder = view['placeholder']
+    try:
+        img_bytes = stitch_tiles(view['images'], view['size'], fmt=fmt)
+    except Exception as e:
+        placeholder.error(f"Lỗi hiển thị trang PDF: {e}")
+        return
+    if img_bytes:
+        with timing.span("st_serialize"):
+            placeholder.image(img_bytes, caption=f"Trang {page_num} (hàng ô {view['first_row'] + 1}–{view['view_rows'][-1] + 1}/{view['rows']})", use_column_width=True)
+    else:
+        placeholder.error("Không thể hiển thị hình ảnh trang.")
+
+def render_page_sidebar(data_dir: str, page_num: int, show_text: bool, section_title: str, backend: str, reading_order: bool = False):
+    """
+    Hiển thị văn bản trích xuất và các nút tải xuống của một trang ở thanh bên.
+
+    Args:
+        data_dir (str): Thư mục dữ liệu.
+        page_num (int): Số trang (bắt đầu từ 1).
+        show_text (bool): Có hiển thị văn bản đã trích xuất hay không.
+        section_title (str): Tên phần đang xem, dùng để đặt tên tệp tải xuống.
+        backend (str): Nguồn lưu trữ trang ("book" hoặc "split").
+        reading_order (bool): Dựng lại văn bản theo thứ tự đọc (theo cột) từ bố cục của trang.
+    """
+    with st.sidebar.expander(f"📄 Trang {page_num}"):
+        # Xác định tệp PDF và chỉ số trang cho trang hiện tại
+        pdf_filename = f"page_{page_num:03}.pdf"
+        pdf_path, page_index = resolve_page_source(data_dir, page_num, backend)
+
+        if backend == "split" and not os.path.isfile(pdf_path):
+            st.error(f"Không tìm thấy tệp PDF '{pdf_filename}' trong '{data_dir}'.")
+            return
+
+        # Trích xuất văn bản từ trang PDF
+        layout = None
+        if show_text and reading_order:
+            try:
+                layout = pymupdf_extract_layout(pdf_path, page_index)
+            except Exception as e:
+                st.warning(f"Không thể dựng văn bản theo thứ tự đọc, dùng văn bản gốc: {e}")
+        if layout is not None:
+            page_text = layout.text_in_reading_order()[:TEXT_VIEW_LIMIT]
+        else:
+            page_text = get_page_text(pdf_path, page_index, page_num)
+
+        if show_text:
+            st.text_area("Văn Bản Đã Trích Xuất:", value=page_text, height=150)
+
+        # Các tùy chọn tải xuống
+        download_col1, download_col2 = st.columns(2)
+
+        # Tải xuống Trang PDF: chỉ đọc tệp khi người dùng yêu cầu, để mỗi lần chạy lại
+        # không phải nạp (và đẩy vào kho media của Streamlit) toàn bộ các trang của phần
+        with download_col1:
+            if page_num not in st.session_state.download_pages:
+                if st.button("📥 Chuẩn Bị Tải Xuống PDF", key=f"prepare_pdf_{page_num}"):
+                    st.session_state.download_pages.add(page_num)
+                    st.rerun()
+            else:
+                try:
+                    with timing.span("download_read"):
+                        if backend == "book":
+                            pdf_bytes = pymupdf_extract_page_pdf(pdf_path, page_number=page_index)
+                        else:
+                            pdf_bytes = read_file_bytes(pdf_path)
+                    with timing.span("st_serialize"):
+                        st.download_button(
+                            label="📥 Tải Xuống Trang PDF",
+                            data=pdf_bytes,
+                            file_name=pdf_filename,
+                            mime="application/pdf"
+                        )
+                except Exception as e:
+                    st.error(f"Lỗi chuẩn bị tải xuống PDF: {e}")
+
+        # Tải xuống Văn Bản Đã Trích Xuất
+        if show_text:
+            with download_col2:
+                try:
+                    buffer = BytesIO()
+                    buffer.write(page_text.encode('utf-8'))
+                    buffer.seek(0)
+                    # Thay thế các ký tự không hợp lệ trong tên tệp
+                    safe_section_name = "".join(c for c in section_title if c.isalnum() or c in (' ', '_', '-')).rstrip()
+                    download_filename = f"{safe_section_name}_Trang_{page_num}.txt"
+                    with timing.span("st_serialize"):
+                        st.download_button(
+                            label="📄 Tải Xuống Văn Bản Đã Trích Xuất",
+                            data=buffer,
+                            file_name=download_filename,
+                            mime="text/plain"
+                        )
+                except Exception as e:
+                    st.error(f"Lỗi chuẩn bị tải xuống văn bản: {e}")
+
+def render_timing_panel(rerun_timings: timing.RerunTimings):
+    """
+    Hiển thị thời gian của lần chạy lại hiện tại theo giai đoạn và theo trang ở thanh bên.
+
+    Khoảng đo của các trang còn đang chuyển đổi trong tiến trình con chỉ được ghi khi chúng xong,
+    nên bảng có thể thiếu các trang đó.
+
+    Args:
+        rerun_timings (timing.RerunTimings): Các khoảng đo của lần chạy lại.
+    """
+    with st.sidebar.expander("🐞 Thời Gian Xử Lý", expanded=True):
+        st.caption(f"Lần chạy lại: {rerun_timings.elapsed * 1000:.0f} ms")
+        flight = single_flight.stats()
+        st.caption(f"Yêu cầu dùng chung kết quả đang chạy: {flight['shared']} / {flight['leaders'] + flight['shared']}")
+        stages = rerun_timings.by_stage()
+        st.dataframe(
+            [{'Giai đoạn': stage, 'Số lần': entry['count'], 'Tổng (ms)': round(entry['seconds'] * 1000, 1)}
+             for stage, entry in sorted(stages.items(), key=lambda item: -item[1]['seconds'])],
+            hide_index=True,
+        )
+        pages = rerun_timings.by_page()
+        if pages:
+            st.dataframe(
+                [{'Trang': page_num, **{stage: round(seconds * 1000, 1) for stage, seconds in page_stages.items()}}
+                 for page_num, page_stages in sorted(pages.items())],
+                hide_index=True,
+            )
+        if METRICS_PORT > 0:
+            st.caption(f"Prometheus: http://127.0.0.1:{METRICS_PORT}/metrics")
+
+def main():
+    rerun_timings = timing.begin_rerun()
+    try:
+        timing.start_metrics_server(METRICS_PORT)
+    except OSError:
+        pass  # Cổng đã bị chiếm (ví dụ bởi tiến trình khác): bỏ qua điểm cuối /metrics
+
+    st.set_page_config(page_title="Giáo dục Tiểu học Khóa 48-A2", layout="wide")
+    st.title("Giáo dục Tiểu học Khóa 48-A2")
+
+    # Định nghĩa thư mục dữ liệu và đường dẫn đến data_detail.txt
+    data_dir = "./data"
+    data_detail_path = "data_detail.txt"
+    backend = resolve_storage_backend(data_dir)
+
+    # Phát hiện tệp dữ liệu đã thay đổi và chỉ xóa dữ liệu dẫn xuất của chúng
+    try:
+        refresh_data_manifest(data_dir, extra_files=(data_detail_path,))
+    except OSError as e:
+        st.warning(f"Không thể kiểm tra thay đổi dữ liệu: {e}")
+
+    # Lấy cây các phần từ mục lục nhúng của data.pdf, hoặc từ data_detail.txt nếu PDF không có mục lục
+    # (được giữ lại giữa các lần chạy lại)
+    book_path = os.path.join(data_dir, BOOK_FILENAME) if backend == "book" else None
+    tree = load_section_tree(data_detail_path, pdf_path=book_path)
+
+    if not tree.sections:
+        st.error("Không tìm thấy phần hợp lệ. Vui lòng kiểm tra mục lục của data.pdf hoặc tệp data_detail.txt của bạn.")
+        return
+
+    # Tìm kiếm toàn văn trên mọi trang
+    search_query = render_search(data_dir, tree, backend)
+
+    # Thanh bên để chọn phần chính (I hoặc II)
+    st.sidebar.header("Chọn Phần Chính")
+    main_sections = tree.roots
+    # Các hộp chọn giữ định danh phần (tên phần có thể trùng nhau giữa các chương)
+    selected_main_id = st.sidebar.selectbox(
+        "Chọn một phần chính:", [section['id'] for section in main_sections],
+        format_func=lambda section_id: tree.get(section_id)['name'], key="main_section",
+    )
+
+    # Tìm phần chính đã chọn
+    selected_main_section_details = tree.get(selected_main_id)
+
+    # Nếu phần chính có phần con (phần II), cho phép chọn các phần con
+    if tree.children_of(selected_main_id):
+        st.sidebar.header("Chọn Phần Con")
+        sub_sections = [selected_main_section_details] + tree.children_of(selected_main_id)
+        selected_sub_id = st.sidebar.selectbox(
+            "Chọn một phần con:", [section['id'] for section in sub_sections],
+            format_func=lambda section_id: tree.get(section_id)['name'], key="sub_section",
+        )
+        
+        # Tìm chi tiết của phần con đã chọn
+        selected_sub_section = tree.get(selected_sub_id)
+        
+        if not selected_sub_section:
+            st.error("Không tìm thấy phần đã chọn.")
+            return
+        
+        # Tạo danh sách số trang cho phần đã chọn
+        page_numbers = get_page_numbers(selected_sub_section)
+        section_title = selected_sub_section['name']
+        section_id = selected_sub_id
+    else:
+        # Nếu phần chính là phần I, hiển thị nội dung tương ứng
+        page_numbers = get_page_numbers(selected_main_section_details)
+        section_title = selected_main_section_details['name']
+        section_id = selected_main_id
+
+    total_pages = len(page_numbers)
+
+    # Khởi tạo trạng thái phiên
+    initialize_session_state(total_pages=total_pages, section_key=section_id)
+
+    # Tùy chọn hiển thị văn bản và mức thu phóng
+    st.sidebar.header("Tùy Chọn Hiển Thị")
+    show_text = st.sidebar.checkbox("Hiển Thị Văn Bản Đã Trích Xuất", value=True)
+    # Trang nhiều cột: xếp lại các dòng theo từng cột thay vì theo thứ tự lưu trong PDF
+    reading_order = st.sidebar.toggle("Văn Bản Theo Thứ Tự Đọc (theo cột)", value=False, disabled=not show_text)
+    zoom_factor = st.sidebar.slider("Mức Thu Phóng", min_value=1.0, max_value=3.0, value=1.5, step=0.1)
+    # Định dạng mặc định theo cấu hình triển khai; người xem có đường truyền chậm có thể chọn WebP/JPEG
+    image_format = st.sidebar.selectbox(
+        "Định Dạng Hình Ảnh",
+        IMAGE_FORMATS,
+        index=IMAGE_FORMATS.index(IMAGE_FORMAT) if IMAGE_FORMAT in IMAGE_FORMATS else 0,
+    )
+    # Chế độ ô là tùy chọn: chế độ thường giữ ảnh thu nhỏ, tô sáng tìm kiếm và các bản đã chuyển đổi trước
+    tiled = zoom_factor >= TILED_ZOOM_THRESHOLD and st.sidebar.toggle("Chế Độ Ô (chỉ tải vùng đang xem)", value=False)
+    # Chế độ phân trang chỉ chuyển đổi các trang trong cửa sổ hiện tại
+    paginated = st.sidebar.toggle("Phân Trang (chỉ tải các trang đang xem)", value=True)
+    window_size = st.sidebar.number_input("Số trang mỗi lần xem", min_value=1, max_value=20, value=PAGE_WINDOW_SIZE, step=1, disabled=not paginated)
+    # Hiển thị trước các nút gọi st.rerun() để trạng thái của công tắc không bị mất khi chạy lại
+    show_timings = st.sidebar.toggle("🐞 Thời Gian Xử Lý (gỡ lỗi)", value=DEBUG_TIMINGS, key="debug_timings")
+
+    if paginated:
+        visible_pages = get_page_window(page_numbers, st.session_state.window_start, window_size)
+    else:
+        visible_pages = page_numbers
+
+    # Màn hình chính: Hiển thị các trang PDF của phần đã chọn
+    st.header(f"📄 {section_title}")
+
+    if paginated:
+        render_page_navigation(total_pages, window_size, key="nav_top")
+
+    if tiled:
+        # Mức thu phóng cao: chỉ chuyển đổi các ô nằm trong vùng xem của từng trang
+        render_tiled_pages(data_dir, visible_pages, zoom_factor, backend, image_format)
+    else:
+        # Tô sáng các từ khớp tìm kiếm trên trang bằng lớp phủ, không chuyển đổi lại PDF
+        highlight_terms = tuple(dict.fromkeys(tokenize(search_query)))
+        render_pages_progressively(data_dir, visible_pages, zoom_factor, backend, image_format, highlight_terms)
+
+    if paginated:
+        render_page_navigation(total_pages, window_size, key="nav_bottom")
+
+    # Sidebar: Phần hiển thị văn bản trích xuất và tải xuống dựa trên từng trang
+    st.sidebar.header("Thông Tin Trang")
+
+    for page_num in visible_pages:
+        with timing.page_context(page_num):
+            render_page_sidebar(data_dir, page_num, show_text, section_title, backend, reading_order)
+
+    timing.record("rerun", rerun_timings.elapsed)
+    if show_timings:
+        render_timing_panel(rerun_timings)